@@ -1,12 +1,32 @@
 import re
 import os
+import datetime
+import subprocess
+import threading
+import time
 import warnings
 
-from typing import Optional, Union
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 from azcopy_wrapper.azcopy_summary import (
     get_transfer_copy_summary_info,
     get_sync_summary_info,
 )
+from azcopy_wrapper.azcopy_watchdog import AzJobWatchdog
+from azcopy_wrapper.azcopy_verification import (
+    AzRemoteFileInfo,
+    find_mismatched_files,
+    iter_local_files,
+    parse_list_output_line,
+)
 from azcopy_wrapper.azcopy_utilities import (
     AzCopyJobInfo,
     AzCopyOptions,
@@ -14,10 +34,48 @@ from azcopy_wrapper.azcopy_utilities import (
     AzRemoteSASLocation,
     AzSyncJobInfo,
     AzSyncOptions,
+    AzTransferPlan,
+    AzWatchdogOptions,
     LocationType,
+    TransferLayout,
 )
+from azcopy_wrapper.azcopy_plan import (
+    AzTransferPlanner,
+    get_throughput,
+    parse_dry_run_line,
+    record_throughput,
+)
+from azcopy_wrapper.azcopy_stream import AzDownloadStream, iter_data_chunks
 from azcopy_wrapper.sas_token_validation import is_sas_token_session_expired
-from azcopy_wrapper.utils.execute_command import execute_command
+from azcopy_wrapper.utils.constants import (
+    DEFAULT_FULL_SYNC_INTERVAL_SECONDS,
+    DEFAULT_STREAM_CHUNK_SIZE,
+    INCLUDE_PATH_BATCH_SIZE,
+    PIPED_DOWNLOAD_EXIT_TIMEOUT_SECONDS,
+    SYNC_WATERMARK_SAFETY_MARGIN_SECONDS,
+)
+from azcopy_wrapper.utils.execute_command import (
+    execute_command,
+    execute_command_with_input,
+    iter_command_status_lines,
+    start_command_with_output_stream,
+)
+from azcopy_wrapper.utils.state_store import JsonStateStore
+
+SYNC_WATERMARKS_STATE_NAME = "sync_watermarks"
+
+# Format of the --include-after option of azcopy
+WATERMARK_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Errors azcopy reports when the filters of a copy do not match any file
+NOTHING_SCHEDULED_MESSAGES = [
+    "no transfers were scheduled",
+    "nothing scheduled",
+    "nothing can be transferred",
+]
+
+# Job status set by the client when azcopy did not schedule any transfer
+NOTHING_SCHEDULED_JOB_STATUS = "NothingScheduled"
 
 
 class AzClient:
@@ -33,25 +91,55 @@ class AzClient:
 
     exe_to_use: str
     artefact_dir: Optional[str]
+    state_store: JsonStateStore
+    watchdog_options: Optional[AzWatchdogOptions]
 
     def __init__(
-        self, exe_to_use: str = "azcopy", artefact_dir: Optional[str] = None
+        self,
+        exe_to_use: str = "azcopy",
+        artefact_dir: Optional[str] = None,
+        watchdog_options: Optional[AzWatchdogOptions] = None,
     ) -> None:
         self.exe_to_use = exe_to_use
         self.artefact_dir = artefact_dir
+        # If set, copy jobs which stall are stopped and resumed
+        self.watchdog_options = watchdog_options
+        # State like the measured throughput is kept in the artefact
+        # directory so that it is available across runs
+        self.state_store = JsonStateStore(artefact_dir)
+
+    def _get_storage_account(
+        self,
+        src: Union[AzRemoteSASLocation, AzLocalLocation],
+        dest: Union[AzRemoteSASLocation, AzLocalLocation],
+    ) -> str:
+        """
+        Returns the storage account the throughput of a job is measured for
+        """
+        if type(dest) == AzRemoteSASLocation:
+            return dest.storage_account  # type: ignore
+        elif type(src) == AzRemoteSASLocation:
+            return src.storage_account  # type: ignore
+        else:
+            return ""
 
     def _copy(
         self,
         src: Union[AzRemoteSASLocation, AzLocalLocation],
         dest: Union[AzRemoteSASLocation, AzLocalLocation],
         transfer_options: AzCopyOptions,
+        on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+        allow_nothing_scheduled: bool = False,
     ) -> AzCopyJobInfo:
         """
         Copies that data from source to destionation
         with the transfer options specified
-        """
-        import re
 
+        on_start is called with every azcopy process started for the job,
+        for ex. to be able to stop it. azcopy fails the job when no file
+        matches the filters, which is reported as a completed job without
+        any transfers if allow_nothing_scheduled is set
+        """
         # Generating the command to be used for subprocess
         cmd = [
             self.exe_to_use,
@@ -63,15 +151,118 @@ class AzClient:
         # Creating AzCopyJobInfo object to store the job info
         job_info = AzCopyJobInfo()
 
+        start_time = time.monotonic()
+
+        while True:
+            watchdog = None
+            if self.watchdog_options is not None:
+                watchdog = AzJobWatchdog(self.watchdog_options)
+
+            def start_job(popen: subprocess.Popen) -> None:
+                if watchdog is not None:
+                    watchdog.start(popen)
+
+                if on_start is not None:
+                    on_start(popen)
+
+            summary = self._collect_copy_output(
+                job_info,
+                execute_command(cmd, on_start=start_job),
+                src=src,
+                dest=dest,
+                watchdog=watchdog,
+            )
+
+            if watchdog is None:
+                break
+
+            watchdog.stop()
+
+            if watchdog.stall_event is None:
+                break
+
+            job_info.stall_events.append(watchdog.stall_event)
+
+            if (
+                len(job_info.job_id) == 0
+                or len(job_info.stall_events) > watchdog.options.max_restarts
+            ):
+                job_info.error_msg = "Job stalled -> {}".format(
+                    watchdog.stall_event["reason"]
+                )
+                break
+
+            # Resuming the job from where it stopped, the error of
+            # the stopped job is not relevant anymore
+            job_info.error_msg = ""
+            job_info.final_job_status_msg = ""
+            cmd = self._get_resume_command(job_info.job_id, src=src, dest=dest)
+
+        job_info = self._finalize_copy_job_info(
+            job_info, summary, allow_nothing_scheduled=allow_nothing_scheduled
+        )
+
+        record_throughput(
+            self.state_store,
+            self._get_storage_account(src, dest),
+            job_info.total_bytes_transferred,
+            time.monotonic() - start_time,
+        )
+
+        return job_info
+
+    def _get_resume_command(
+        self,
+        job_id: str,
+        src: Union[AzRemoteSASLocation, AzLocalLocation],
+        dest: Union[AzRemoteSASLocation, AzLocalLocation],
+    ) -> List[str]:
+        """
+        Generates the command to resume a stopped azcopy job
+        """
+        cmd = [self.exe_to_use, "jobs", "resume", job_id]
+
+        # azcopy does not store the SAS tokens of a job
+        if isinstance(src, AzRemoteSASLocation) and len(src.sas_token) > 0:
+            cmd.append(f"--source-sas={src.sas_token}")
+
+        if isinstance(dest, AzRemoteSASLocation) and len(dest.sas_token) > 0:
+            cmd.append(f"--destination-sas={dest.sas_token}")
+
+        return cmd
+
+    def _collect_copy_output(
+        self,
+        job_info: AzCopyJobInfo,
+        output_lines: Iterable[str],
+        src: Optional[Union[AzRemoteSASLocation, AzLocalLocation]],
+        dest: Optional[Union[AzRemoteSASLocation, AzLocalLocation]],
+        watchdog: Optional[AzJobWatchdog] = None,
+    ) -> str:
+        """
+        Reads the output of an azcopy copy job, updating the job info
+        with the progress and returning the job summary text
+        """
+        summary = ""
+
         try:
-            summary = ""
             # A boolean flag to be set as True when
             # azcopy starts sending summary information
             unlock_summary = False
 
-            for output_line in execute_command(cmd):
+            for output_line in output_lines:
                 print(output_line, end="")
 
+                if watchdog is not None:
+                    watchdog.observe(output_line)
+
+                # Job id is sent at the start of the job ->
+                # Job {job_id} has started
+                job_id_match = re.match(r"Job (?P<job_id>\S+) has started", output_line)
+
+                if job_id_match is not None:
+                    job_info.job_id = job_id_match.group("job_id")
+
                 # Extracting the percent complete information from the
                 # current output line and updating it in the job_info
                 if "%" in output_line:
@@ -102,6 +293,12 @@ class AzClient:
                 if "Final Job Status:" in output_line:
                     job_info.final_job_status_msg = output_line.split(":")[-1].strip()
 
+                if any(
+                    message in output_line.lower()
+                    for message in NOTHING_SCHEDULED_MESSAGES
+                ):
+                    job_info.final_job_status_msg = NOTHING_SCHEDULED_JOB_STATUS
+
         except Exception as e:
             # Checking if the error is because of the sas token
 
@@ -121,6 +318,18 @@ class AzClient:
 
             job_info.completed = False
 
+        return summary
+
+    def _finalize_copy_job_info(
+        self,
+        job_info: AzCopyJobInfo,
+        summary: str,
+        allow_nothing_scheduled: bool = False,
+    ) -> AzCopyJobInfo:
+        """
+        Fills the job info from the job summary and raises
+        if the copy job did not complete
+        """
         # Get the final job summary info
         job_info = get_transfer_copy_summary_info(job_info, summary)
 
@@ -129,6 +338,14 @@ class AzClient:
             or job_info.final_job_status_msg == "CompletedWithSkipped"
         ):
             job_info.completed = True
+        elif (
+            allow_nothing_scheduled
+            and job_info.final_job_status_msg == NOTHING_SCHEDULED_JOB_STATUS
+        ):
+            # The error is only the failed exit code of azcopy
+            job_info.error_msg = ""
+            job_info.percent_complete = float(100)
+            job_info.completed = True
         elif job_info.number_of_transfers_failed > 0:
             job_info.error_msg += "; Tranfers failed = {}".format(
                 job_info.number_of_transfers_failed
@@ -147,10 +364,14 @@ class AzClient:
         src: Union[AzRemoteSASLocation, AzLocalLocation],
         dest: Union[AzRemoteSASLocation, AzLocalLocation],
         transfer_options: AzSyncOptions,
+        on_start: Optional[Callable[[subprocess.Popen], None]] = None,
     ) -> AzSyncJobInfo:
         """
         Syncs that data from source to destionation
         with the transfer options specified
+
+        on_start is called with the started azcopy process,
+        for ex. to be able to stop it
         """
         # Generating the command to be used for subprocess
         cmd = [
@@ -163,13 +384,15 @@ class AzClient:
         # Creating AzSyncJobInfo object to store the job info
         job_info = AzSyncJobInfo()
 
+        start_time = time.monotonic()
+
         try:
             summary = ""
             # A boolean flag to be set as True when
             # azcopy starts sending summary information
             unlock_summary = False
 
-            for output_line in execute_command(cmd):
+            for output_line in execute_command(cmd, on_start=on_start):
                 print(output_line, end="")
 
                 # Extracting the percent complete information from the
@@ -229,8 +452,65 @@ class AzClient:
             job_info.completed = False
             raise Exception(job_info.error_msg)
 
+        record_throughput(
+            self.state_store,
+            self._get_storage_account(src, dest),
+            job_info.total_number_of_bytes_transferred,
+            time.monotonic() - start_time,
+        )
+
         return job_info
 
+    def plan(
+        self,
+        src: Union[AzRemoteSASLocation, AzLocalLocation],
+        dest: Union[AzRemoteSASLocation, AzLocalLocation],
+        transfer_options: Union[AzCopyOptions, AzSyncOptions],
+        largest_files_count: int = 10,
+    ) -> AzTransferPlan:
+        """
+        Plans a copy or sync without sending any data
+
+        azcopy runs the job in --dry-run mode and the planned operations are
+        summarised as they are received: number of transfers and deletions,
+        bytes, largest files and a breakdown per top level prefix. The duration
+        is estimated from the throughput measured in earlier jobs for the same
+        storage account
+        """
+        command = "sync" if isinstance(transfer_options, AzSyncOptions) else "cp"
+
+        # Generating the command to be used for subprocess
+        cmd = [
+            self.exe_to_use,
+            command,
+            str(src),
+            str(dest),
+            "--dry-run",
+            "--output-type",
+            "json",
+        ] + transfer_options.get_options_list()
+
+        if type(src) == AzRemoteSASLocation:
+            source_root = src.get_resource_uri() + src.path  # type: ignore
+        else:
+            source_root = src.path
+
+        planner = AzTransferPlanner(
+            source_root, largest_files_count=largest_files_count
+        )
+
+        for output_line in execute_command(cmd):
+            planned_transfer = parse_dry_run_line(output_line)
+
+            if planned_transfer is not None:
+                planner.add(*planned_transfer)
+
+        throughput = get_throughput(
+            self.state_store, self._get_storage_account(src, dest)
+        )
+
+        return planner.get_plan(throughput)
+
     # def download_file_to_local_path(
     #     self,
     #     src: AzRemoteSASLocation,
@@ -275,6 +555,106 @@ class AzClient:
     ) -> AzCopyJobInfo:
         return self._copy(src=src, dest=dest, transfer_options=transfer_options)
 
+    def download_stream(
+        self,
+        src: AzRemoteSASLocation,
+        transfer_options: AzCopyOptions,
+        chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+    ) -> AzDownloadStream:
+        """
+        Downloads a single remote blob into a readable binary stream
+        without writing it to the local disk
+
+        azcopy runs in piped mode (--from-to BlobPipe) and the data can be
+        consumed while it is being downloaded. The job info is available on the
+        stream once all the data has been read. Closing the stream before that
+        stops the download.
+        """
+        if transfer_options.recursive:
+            raise Exception("Cannot use --recursive when downloading to a stream")
+
+        # Generating the command to be used for subprocess
+        cmd = [
+            self.exe_to_use,
+            "cp",
+            str(src),
+            "--from-to",
+            "BlobPipe",
+        ] + transfer_options.get_options_list()
+
+        # Creating AzCopyJobInfo object to store the job info
+        job_info = AzCopyJobInfo()
+
+        popen = start_command_with_output_stream(cmd)
+
+        # The status is sent on stderr while stdout carries the data,
+        # so it is read in the background as the data is consumed
+        status_result: dict = {"summary": "", "error": None}
+
+        def collect_status() -> None:
+            try:
+                status_result["summary"] = self._collect_copy_output(
+                    job_info,
+                    iter_command_status_lines(popen, cmd),
+                    src=src,
+                    dest=None,
+                )
+            except Exception as e:
+                status_result["error"] = e
+
+        status_thread = threading.Thread(target=collect_status, daemon=True)
+        status_thread.start()
+
+        def finish_job(bytes_read: int, aborted: bool) -> AzCopyJobInfo:
+            if aborted:
+                # A consumer which read exactly all the data may close the
+                # stream without reading the end of it, so azcopy is given
+                # a moment to exit before checking for unread data
+                try:
+                    popen.wait(timeout=PIPED_DOWNLOAD_EXIT_TIMEOUT_SECONDS)
+                    aborted = len(popen.stdout.read(1)) > 0  # type: ignore
+                except subprocess.TimeoutExpired:
+                    pass
+
+            if aborted:
+                popen.kill()
+
+            status_thread.join()
+
+            if aborted:
+                job_info.error_msg = (
+                    "Download stream was closed before all the data was read"
+                )
+                job_info.completed = False
+                return job_info
+
+            if status_result["error"] is not None:
+                raise status_result["error"]
+
+            # azcopy does not print the job summary in piped mode,
+            # a successful exit is reported as a completed job
+            if (
+                len(job_info.error_msg) == 0
+                and len(job_info.final_job_status_msg) == 0
+            ):
+                job_info.final_job_status_msg = "Completed"
+                job_info.percent_complete = float(100)
+
+            finished_job_info = self._finalize_copy_job_info(
+                job_info, status_result["summary"]
+            )
+
+            if finished_job_info.total_bytes_transferred == 0:
+                finished_job_info.total_bytes_transferred = bytes_read
+
+            return finished_job_info
+
+        return AzDownloadStream(
+            popen.stdout,  # type: ignore
+            finish_job,
+            chunk_size=chunk_size,
+        )
+
     def upload_data_to_remote_location(
         self,
         src: AzRemoteSASLocation,
@@ -283,6 +663,46 @@ class AzClient:
     ) -> AzCopyJobInfo:
         return self._copy(src=src, dest=dest, transfer_options=transfer_options)
 
+    def upload_stream(
+        self,
+        src: Union[bytes, bytearray, memoryview, Iterable[bytes], BinaryIO],
+        dest: AzRemoteSASLocation,
+        transfer_options: AzCopyOptions,
+        chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+    ) -> AzCopyJobInfo:
+        """
+        Uploads data produced in-process to a single remote blob
+        without staging it on the local disk
+
+        The source can be a bytes-like object, an iterable of bytes
+        or a readable binary file object.
+        The data is piped to azcopy's stdin (--from-to PipeBlob) one chunk at a
+        time, so the memory used stays fixed regardless of the size of the data
+        """
+        if transfer_options.recursive:
+            raise Exception("Cannot use --recursive when uploading from a stream")
+
+        # Generating the command to be used for subprocess
+        cmd = [
+            self.exe_to_use,
+            "cp",
+            str(dest),
+            "--from-to",
+            "PipeBlob",
+        ] + transfer_options.get_options_list()
+
+        # Creating AzCopyJobInfo object to store the job info
+        job_info = AzCopyJobInfo()
+
+        output_lines = execute_command_with_input(
+            cmd, iter_data_chunks(src, chunk_size=chunk_size)
+        )
+        summary = self._collect_copy_output(
+            job_info, output_lines, src=None, dest=dest
+        )
+
+        return self._finalize_copy_job_info(job_info, summary)
+
     def copy_remote_data_from_container_to_container(
         self,
         src: AzRemoteSASLocation,
@@ -308,6 +728,98 @@ class AzClient:
 
         return self._sync(src=src, dest=dest, transfer_options=transfer_options)
 
+    def incremental_sync_to_local_location(
+        self,
+        src: AzRemoteSASLocation,
+        dest: AzLocalLocation,
+        transfer_options: AzSyncOptions,
+        full_sync_interval_seconds: float = DEFAULT_FULL_SYNC_INTERVAL_SECONDS,
+    ) -> Union[AzCopyJobInfo, AzSyncJobInfo]:
+        """
+        Syncs the remote data to the local location, only transferring the
+        files modified since the last successful sync of the same locations
+
+        The time of the last sync is kept as a watermark in the artefact
+        directory and the changed files are downloaded with a recursive copy
+        using --include-after. A full sync runs instead when there is no
+        watermark yet or the last full sync is older than
+        full_sync_interval_seconds. Files deleted at the source are only
+        removed locally by the full sync, when delete_destination is set
+        """
+        if not os.path.exists(dest.path):
+            raise Exception(
+                f"{dest.path} does not exist. For sync operation, the given path needs to exist"
+            )
+
+        watermark_key = (
+            f"{src.get_resource_uri()}{src.path} -> {os.path.abspath(dest.path)}"
+        )
+        sync_watermarks = self.state_store.load(SYNC_WATERMARKS_STATE_NAME)
+        watermark = sync_watermarks.get(watermark_key)
+
+        start_time = datetime.datetime.now(datetime.timezone.utc)
+        next_watermark_time = (
+            start_time
+            - datetime.timedelta(seconds=SYNC_WATERMARK_SAFETY_MARGIN_SECONDS)
+        ).strftime(WATERMARK_TIME_FORMAT)
+
+        is_full_sync_due = True
+        if watermark is not None:
+            last_full_sync_time = datetime.datetime.strptime(
+                watermark["last_full_sync_time"], WATERMARK_TIME_FORMAT
+            ).replace(tzinfo=datetime.timezone.utc)
+
+            is_full_sync_due = (
+                start_time - last_full_sync_time
+            ).total_seconds() >= full_sync_interval_seconds
+
+        job_info: Union[AzCopyJobInfo, AzSyncJobInfo]
+
+        if is_full_sync_due:
+            job_info = self.sync_to_local_location(
+                src=src, dest=dest, transfer_options=transfer_options
+            )
+            watermark = {"last_full_sync_time": next_watermark_time}
+        else:
+            # Copying the contents of the remote directory into the
+            # local directory, the same layout as the sync
+            remote_path = src.path
+            if len(remote_path) > 0 and not remote_path.endswith("/"):
+                remote_path += "/"
+
+            copy_src = AzRemoteSASLocation(
+                storage_account=src.storage_account,
+                container=src.container,
+                path=remote_path,
+                use_wildcard=True,
+                sas_token=src.sas_token,
+            )
+
+            job_info = self._copy(
+                src=copy_src,
+                dest=dest,
+                transfer_options=AzCopyOptions(
+                    overwrite_existing=True,
+                    # azcopy sync is always recursive, with or without --recursive
+                    recursive=True,
+                    exclude_path=transfer_options.exclude_path,
+                    include_after=watermark["last_sync_time"],  # type: ignore
+                ),
+                # Nothing changed since the last sync
+                allow_nothing_scheduled=True,
+            )
+
+        # Only saving the watermark once the job completed,
+        # a failed job raises before reaching here
+        watermark["last_sync_time"] = next_watermark_time  # type: ignore
+
+        def update_watermark(sync_watermarks: dict) -> None:
+            sync_watermarks[watermark_key] = watermark
+
+        self.state_store.update(SYNC_WATERMARKS_STATE_NAME, update_watermark)
+
+        return job_info
+
     def sync_to_remote_location(
         self,
         src: AzLocalLocation,
@@ -320,3 +832,203 @@ class AzClient:
             )
 
         return self._sync(src=src, dest=dest, transfer_options=transfer_options)
+
+    ####################################################################
+    # Verify Data
+    ####################################################################
+
+    def _list_remote_files(
+        self, remote: AzRemoteSASLocation
+    ) -> Dict[str, AzRemoteFileInfo]:
+        """
+        Lists the size and Content-MD5 of all the files under the remote location
+        """
+        list_location = AzRemoteSASLocation(
+            storage_account=remote.storage_account,
+            container=remote.container,
+            path=remote.path,
+            sas_token=remote.sas_token,
+        )
+
+        cmd = [
+            self.exe_to_use,
+            "list",
+            str(list_location),
+            "--properties",
+            "ContentMD5",
+            "--machine-readable",
+        ]
+
+        remote_files = {}
+
+        for output_line in execute_command(cmd):
+            remote_file = parse_list_output_line(output_line)
+
+            if remote_file is not None:
+                remote_files[remote_file.path] = remote_file
+
+        return remote_files
+
+    def verify_local_against_remote(
+        self,
+        remote: AzRemoteSASLocation,
+        local: AzLocalLocation,
+        job_info: Optional[Union[AzCopyJobInfo, AzSyncJobInfo]] = None,
+        retransfer_mismatches: bool = False,
+        max_workers: Optional[int] = None,
+        use_processes: bool = False,
+        layout: Optional[str] = None,
+    ) -> Union[AzCopyJobInfo, AzSyncJobInfo]:
+        """
+        Verifies the local data against the size and Content-MD5 of the remote data
+        after a download or sync, and stores the result in the job info
+
+        The local files are hashed by a pool of max_workers threads, or processes
+        if use_processes is set, using all cores by default. Remote files which
+        are missing or different locally are reported in
+        job_info.verification_mismatches and, if retransfer_mismatches is set,
+        only those files are downloaded again and verified once more.
+
+        Blobs uploaded without put_md5 do not have a Content-MD5,
+        so they are only verified by size.
+
+        The layout, TransferLayout.COPY or TransferLayout.SYNC, tells where the
+        local files are looked up. By default it is the layout of the job whose
+        job info is given, and the copy layout without a job info. If none of
+        the remote files are found locally, the layout is most likely wrong and
+        nothing is transferred again
+        """
+        if layout is None:
+            layout = TransferLayout.COPY
+            if isinstance(job_info, AzSyncJobInfo):
+                layout = TransferLayout.SYNC
+
+        if job_info is None:
+            job_info = AzCopyJobInfo()
+
+        remote_files = self._list_remote_files(remote)
+        local_root = self._get_local_root(remote, local, layout)
+        is_single_file = os.path.isfile(local_root)
+
+        def find_mismatches(
+            paths: Optional[List[str]] = None,
+        ) -> Tuple[int, List[str]]:
+            files_to_verify = remote_files
+            local_files: Iterable = iter_local_files(local_root)
+
+            if is_single_file:
+                local_files = [(path, local_root) for path in remote_files]
+            elif paths is not None:
+                # Only checking the files which were transferred again
+                files_to_verify = {path: remote_files[path] for path in paths}
+                local_files = [
+                    (path, os.path.join(local_root, *path.split("/")))
+                    for path in paths
+                ]
+
+            return find_mismatched_files(
+                files_to_verify,
+                local_files,
+                max_workers=max_workers,
+                use_processes=use_processes,
+            )
+
+        if is_single_file and len(remote_files) == 0:
+            job_info.number_of_files_verified = 1
+            mismatches = [remote.path]
+        else:
+            job_info.number_of_files_verified, mismatches = find_mismatches()
+
+        if retransfer_mismatches and len(mismatches) > 0 and len(remote_files) > 0:
+            if (
+                not is_single_file
+                and len(mismatches) == len(remote_files)
+                and not any(
+                    os.path.exists(os.path.join(local_root, *path.split("/")))
+                    for path in mismatches
+                )
+            ):
+                # Transferring again would write a second copy of the
+                # whole remote data next to the existing local data
+                raise Exception(
+                    f"None of the remote files were found in {local_root}. "
+                    f"Check that the layout '{layout}' matches the transfer "
+                    "that was verified"
+                )
+
+            self._retransfer_files(remote, local_root, mismatches, is_single_file)
+            job_info.number_of_files_reverified, mismatches = find_mismatches(
+                mismatches
+            )
+
+        job_info.verification_mismatches = mismatches
+
+        return job_info
+
+    def _get_local_root(
+        self, remote: AzRemoteSASLocation, local: AzLocalLocation, layout: str
+    ) -> str:
+        """
+        Returns the local path where azcopy puts the remote data. Without a
+        wildcard, cp creates the remote directory itself in the local directory
+        """
+        if (
+            layout == TransferLayout.SYNC
+            or remote.use_wildcard
+            or not os.path.isdir(local.path)
+        ):
+            return local.path
+
+        remote_name = os.path.basename(remote.path.rstrip("/"))
+        if len(remote_name) == 0:
+            remote_name = remote.container
+
+        return os.path.join(local.path, remote_name)
+
+    def _retransfer_files(
+        self,
+        remote: AzRemoteSASLocation,
+        local_root: str,
+        relative_paths: List[str],
+        is_single_file: bool,
+    ) -> None:
+        """
+        Downloads again only the given files from the remote location
+        """
+        local = AzLocalLocation(path=local_root)
+
+        if is_single_file:
+            self._copy(
+                src=remote,
+                dest=local,
+                transfer_options=AzCopyOptions(overwrite_existing=True),
+            )
+            return
+
+        # Copying the contents of the remote directory into the
+        # local directory, the same layout that was verified
+        remote_path = remote.path
+        if len(remote_path) > 0 and not remote_path.endswith("/"):
+            remote_path += "/"
+
+        src = AzRemoteSASLocation(
+            storage_account=remote.storage_account,
+            container=remote.container,
+            path=remote_path,
+            use_wildcard=True,
+            sas_token=remote.sas_token,
+        )
+
+        # Keeping the command line short when many files need to be transferred
+        for batch_start in range(0, len(relative_paths), INCLUDE_PATH_BATCH_SIZE):
+            batch = relative_paths[batch_start : batch_start + INCLUDE_PATH_BATCH_SIZE]
+
+            self._copy(
+                src=src,
+                dest=local,
+                transfer_options=AzCopyOptions(
+                    overwrite_existing=True,
+                    recursive=True,
+                    include_path=";".join(batch),
+                ),
+            )
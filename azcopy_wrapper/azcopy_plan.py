@@ -0,0 +1,179 @@
+import heapq
+import json
+import os
+
+from typing import List, Optional, Tuple
+
+from azcopy_wrapper.azcopy_utilities import AzTransferPlan
+from azcopy_wrapper.utils.state_store import JsonStateStore
+
+THROUGHPUT_STATE_NAME = "throughput_history"
+
+# Weight of the latest measurement in the moving average of the throughput
+THROUGHPUT_SMOOTHING_FACTOR = 0.3
+
+# Jobs shorter than this are dominated by the startup time of azcopy
+# and do not give a useful throughput measurement
+MIN_THROUGHPUT_MEASUREMENT_SECONDS = 5.0
+
+
+def parse_dry_run_line(output_line: str) -> Optional[Tuple[str, str, Optional[int]]]:
+    """
+    Extracts the operation, source and source size of a planned transfer
+    from a line of the azcopy --dry-run --output-type json output
+    """
+    try:
+        message = json.loads(output_line)
+    except ValueError:
+        return None
+
+    if not isinstance(message, dict) or message.get("MessageType") != "Dryrun":
+        return None
+
+    message_content = message.get("MessageContent", "")
+
+    try:
+        transfer = json.loads(message_content)
+    except ValueError:
+        # Older azcopy versions send the same text as the text output ->
+        # DRYRUN: copy {source} to {destination}
+        # DRYRUN: remove {source}
+        text = message_content.strip()
+
+        if text.startswith("DRYRUN: remove "):
+            return "remove", text[len("DRYRUN: remove ") :], None
+
+        if text.startswith("DRYRUN: copy "):
+            source = text[len("DRYRUN: copy ") :].rsplit(" to ", 1)[0]
+            return "copy", source, None
+
+        return None
+
+    if not isinstance(transfer, dict):
+        return None
+
+    source = transfer.get("Source", "")
+    source_size = transfer.get("SourceSize")
+
+    # Deletions planned by sync do not have a destination
+    if len(transfer.get("Destination", "")) == 0:
+        return "remove", source, None
+
+    return "copy", source, source_size
+
+
+class AzTransferPlanner:
+    """
+    Builds a compact AzTransferPlan from the planned operations
+    of a dry run, without keeping the individual operations
+    """
+
+    def __init__(self, source_root: str, largest_files_count: int = 10) -> None:
+        self.source_root = source_root.rstrip("/\\")
+        self.largest_files_count = largest_files_count
+        self.plan = AzTransferPlan()
+        self._largest_files: List[Tuple[int, str]] = []
+
+    def _get_relative_path(self, source: str) -> str:
+        source = source.split("?")[0]
+
+        if source.startswith(self.source_root):
+            source = source[len(self.source_root) :]
+
+        return source.replace("\\", "/").lstrip("/")
+
+    def add(self, operation: str, source: str, source_size: Optional[int]) -> None:
+        relative_path = self._get_relative_path(source)
+
+        if operation == "remove":
+            self.plan.number_of_deletions += 1
+            return
+
+        if source_size is None:
+            # Local sources can be sized without sending any data
+            source_size = os.path.getsize(source) if os.path.isfile(source) else 0
+
+        self.plan.number_of_transfers += 1
+        self.plan.total_bytes += source_size
+
+        prefix = relative_path.split("/")[0] if "/" in relative_path else "."
+        self.plan.files_per_prefix[prefix] = (
+            self.plan.files_per_prefix.get(prefix, 0) + 1
+        )
+        self.plan.bytes_per_prefix[prefix] = (
+            self.plan.bytes_per_prefix.get(prefix, 0) + source_size
+        )
+
+        # Keeping only the largest files seen so far in a min heap
+        largest_file = (source_size, relative_path)
+        if len(self._largest_files) < self.largest_files_count:
+            heapq.heappush(self._largest_files, largest_file)
+        elif largest_file > self._largest_files[0]:
+            heapq.heapreplace(self._largest_files, largest_file)
+
+    def get_plan(self, throughput: Optional[float] = None) -> AzTransferPlan:
+        self.plan.largest_files = [
+            (relative_path, size)
+            for size, relative_path in sorted(self._largest_files, reverse=True)
+        ]
+
+        if throughput is not None and throughput > 0:
+            self.plan.throughput_bytes_per_second = throughput
+            self.plan.estimated_duration_seconds = self.plan.total_bytes / throughput
+
+        return self.plan
+
+
+def get_throughput(
+    state_store: JsonStateStore, storage_account: str
+) -> Optional[float]:
+    """
+    Returns the measured throughput in bytes per second for the storage account
+
+    Like recording it, errors are printed and the plan is
+    returned without an estimated duration
+    """
+    try:
+        throughput_history = state_store.load(THROUGHPUT_STATE_NAME)
+    except Exception as e:
+        print(f"Could not read the throughput of {storage_account} -> {e}")
+        return None
+
+    return throughput_history.get(storage_account)
+
+
+def record_throughput(
+    state_store: JsonStateStore,
+    storage_account: str,
+    bytes_transferred: int,
+    elapsed_seconds: float,
+) -> None:
+    """
+    Updates the moving average of the throughput for the storage account
+
+    The throughput is only used for estimates, so errors are printed
+    instead of failing the job which was measured
+    """
+    if (
+        len(storage_account) == 0
+        or bytes_transferred <= 0
+        or elapsed_seconds < MIN_THROUGHPUT_MEASUREMENT_SECONDS
+    ):
+        return
+
+    def update_throughput(throughput_history: dict) -> None:
+        throughput = bytes_transferred / elapsed_seconds
+        previous_throughput = throughput_history.get(storage_account)
+
+        if previous_throughput is not None:
+            throughput = (
+                THROUGHPUT_SMOOTHING_FACTOR * throughput
+                + (1 - THROUGHPUT_SMOOTHING_FACTOR) * previous_throughput
+            )
+
+        throughput_history[storage_account] = throughput
+
+    try:
+        state_store.update(THROUGHPUT_STATE_NAME, update_throughput)
+    except Exception as e:
+        print(f"Could not record the throughput of {storage_account} -> {e}")
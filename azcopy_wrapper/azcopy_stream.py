@@ -0,0 +1,132 @@
+import io
+
+from typing import Any, BinaryIO, Callable, Generator, Iterable, Optional, Union
+
+from azcopy_wrapper.azcopy_utilities import AzCopyJobInfo
+from azcopy_wrapper.utils.constants import DEFAULT_STREAM_CHUNK_SIZE
+
+
+def iter_data_chunks(
+    data: Union[bytes, bytearray, memoryview, Iterable[bytes], BinaryIO],
+    chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+) -> Generator[bytes, None, None]:
+    """
+    Yields the data to be piped to azcopy in chunks
+
+    File objects are read into a single reusable buffer, so every yielded chunk
+    is only valid until the next one is requested
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        # Iterating over bytes would give single ints,
+        # so the data is sliced without copying it instead
+        data_view = memoryview(data).cast("B")
+
+        for offset in range(0, len(data_view), chunk_size):
+            yield data_view[offset : offset + chunk_size]  # type: ignore
+
+    elif hasattr(data, "readinto"):
+        buffer = bytearray(chunk_size)
+        buffer_view = memoryview(buffer)
+
+        while True:
+            bytes_read = data.readinto(buffer)  # type: ignore
+
+            if not bytes_read:
+                break
+
+            yield buffer_view[:bytes_read]  # type: ignore
+
+    elif hasattr(data, "read"):
+        while True:
+            chunk = data.read(chunk_size)  # type: ignore
+
+            if not chunk:
+                break
+
+            yield chunk
+
+    else:
+        for chunk in data:  # type: ignore
+            if chunk:
+                yield chunk
+
+
+class AzDownloadStream(io.RawIOBase):
+    """
+    Readable binary stream over the data downloaded by azcopy in
+    piped mode (--from-to BlobPipe)
+
+    The data can be read like any other file object or consumed with
+    iter_chunks(). Once all the data is read the azcopy job is checked and the
+    job info is available in job_info. Any error in the job is raised from the
+    read that reaches the end of the data, the same way as the other copy
+    methods of AzClient.
+    """
+
+    job_info: Optional[AzCopyJobInfo]
+    bytes_read: int
+    chunk_size: int
+
+    def __init__(
+        self,
+        data_stream: BinaryIO,
+        finish_job: Callable[[int, bool], AzCopyJobInfo],
+        chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+    ) -> None:
+        super().__init__()
+        self.job_info = None
+        self.bytes_read = 0
+        self.chunk_size = chunk_size
+        self._data_stream = data_stream
+        self._finish_job = finish_job
+        self._finished = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        # Returning the data already received instead of waiting
+        # for the whole buffer to be filled
+        bytes_read = self._data_stream.readinto1(buffer)  # type: ignore
+
+        if not bytes_read:
+            self._finish(aborted=False)
+            return 0
+
+        self.bytes_read += bytes_read
+
+        return bytes_read
+
+    def iter_chunks(self) -> Generator[bytes, None, None]:
+        """
+        Yields the downloaded data in chunks of at most chunk_size bytes
+
+        All the chunks are views on a single reusable buffer, so every chunk
+        is only valid until the next one is requested
+        """
+        buffer = bytearray(self.chunk_size)
+        buffer_view = memoryview(buffer)
+
+        while True:
+            bytes_read = self.readinto(buffer)
+
+            if not bytes_read:
+                break
+
+            yield buffer_view[:bytes_read]  # type: ignore
+
+    def close(self) -> None:
+        if not self.closed:
+            try:
+                # Closing before reaching the end of the data stops the download
+                self._finish(aborted=True)
+            finally:
+                self._data_stream.close()
+                super().close()
+
+    def _finish(self, aborted: bool) -> None:
+        if self._finished:
+            return
+
+        self._finished = True
+        self.job_info = self._finish_job(self.bytes_read, aborted)
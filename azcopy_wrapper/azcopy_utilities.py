@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from azcopy_wrapper.sas_token_validation import is_sas_token_session_expired
 
@@ -14,6 +14,20 @@ class LocationType:
     DEST = "destination"
 
 
+class TransferLayout:
+    """
+    This type is used to specify how the remote data
+    was laid out locally by the AzCopy command
+
+    cp creates a remote directory given without a wildcard in the local
+    directory, while sync puts the contents of the remote directory
+    directly in the local directory
+    """
+
+    COPY = "copy"
+    SYNC = "sync"
+
+
 class AzRemoteSASLocation:
     """
     Class to create Azure Remote Location with SAS Token
@@ -108,6 +122,8 @@ class AzCopyOptions:
     recursive: bool
     put_md5: bool
     exclude_path: str
+    include_path: str
+    include_after: str
 
     def __init__(
         self,
@@ -115,11 +131,15 @@ class AzCopyOptions:
         recursive: bool = False,
         put_md5: bool = False,
         exclude_path: str = "",
+        include_path: str = "",
+        include_after: str = "",
     ) -> None:
         self.overwrite_existing = overwrite_existing
         self.recursive = recursive
         self.put_md5 = put_md5
         self.exclude_path = exclude_path
+        self.include_path = include_path
+        self.include_after = include_after
 
     def get_options_list(self) -> List[str]:
         transfer_options = []
@@ -144,6 +164,17 @@ class AzCopyOptions:
             transfer_options.append("--exclude-path")
             transfer_options.append(self.exclude_path)
 
+        # Include only these paths when copying.
+        if len(self.include_path) > 0:
+            transfer_options.append("--include-path")
+            transfer_options.append(self.include_path)
+
+        # Include only files modified on or after this date time (ISO8601 format,
+        # for ex. 2020-08-19T15:04:00Z).
+        if len(self.include_after) > 0:
+            transfer_options.append("--include-after")
+            transfer_options.append(self.include_after)
+
         return transfer_options
 
 
@@ -155,16 +186,19 @@ class AzSyncOptions:
     recursive: bool
     put_md5: bool
     exclude_path: str
+    delete_destination: bool
 
     def __init__(
         self,
         recursive: bool = False,
         put_md5: bool = False,
         exclude_path: str = "",
+        delete_destination: bool = False,
     ) -> None:
         self.recursive = recursive
         self.put_md5 = put_md5
         self.exclude_path = exclude_path
+        self.delete_destination = delete_destination
 
     def get_options_list(self) -> List[str]:
         transfer_options = []
@@ -182,9 +216,40 @@ class AzSyncOptions:
             transfer_options.append("--exclude-path")
             transfer_options.append(self.exclude_path)
 
+        # Delete the files of the destination which do not exist at the source
+        if self.delete_destination:
+            transfer_options.append("--delete-destination")
+            transfer_options.append("true")
+
         return transfer_options
 
 
+class AzWatchdogOptions:
+    """
+    Class to give the options used to detect stalled copy jobs
+    """
+
+    stall_window_seconds: float
+    min_throughput_mbps: Optional[float]
+    max_restarts: int
+    check_interval_seconds: float
+
+    def __init__(
+        self,
+        stall_window_seconds: float = 15 * 60,
+        min_throughput_mbps: Optional[float] = None,
+        max_restarts: int = 3,
+        check_interval_seconds: float = 10,
+    ) -> None:
+        # A job is stalled when its progress stays flat, or its throughput
+        # (in Mb/s, as reported by azcopy) stays below min_throughput_mbps,
+        # for longer than stall_window_seconds
+        self.stall_window_seconds = stall_window_seconds
+        self.min_throughput_mbps = min_throughput_mbps
+        self.max_restarts = max_restarts
+        self.check_interval_seconds = check_interval_seconds
+
+
 class AzCopyJobInfo:
     """
     Created the job info of the Azcopy job executed by the user
@@ -201,6 +266,11 @@ class AzCopyJobInfo:
     total_bytes_transferred: int
     final_job_status_msg: str
     completed: bool
+    number_of_files_verified: int
+    number_of_files_reverified: int
+    verification_mismatches: List[str]
+    job_id: str
+    stall_events: List[dict]
 
     def __init__(
         self,
@@ -215,6 +285,11 @@ class AzCopyJobInfo:
         number_of_transfers_skipped: int = 0,
         total_bytes_transferred: int = 0,
         completed: bool = False,
+        number_of_files_verified: int = 0,
+        number_of_files_reverified: int = 0,
+        verification_mismatches: Optional[List[str]] = None,
+        job_id: str = "",
+        stall_events: Optional[List[dict]] = None,
     ) -> None:
         # NOTE: Sometimes, azcopy doesn't return value as 100%
         # even if the entire data is transferred.
@@ -232,6 +307,14 @@ class AzCopyJobInfo:
         self.number_of_transfers_skipped = number_of_transfers_skipped
         self.total_bytes_transferred = total_bytes_transferred
         self.completed = completed
+        # Filled by AzClient.verify_local_against_remote
+        self.number_of_files_verified = number_of_files_verified
+        # Files verified again after retransferring the mismatched files
+        self.number_of_files_reverified = number_of_files_reverified
+        self.verification_mismatches = verification_mismatches or []
+        self.job_id = job_id
+        # Filled when the watchdog of the AzClient stops a stalled job
+        self.stall_events = stall_events or []
 
 
 class AzSyncJobInfo:
@@ -255,6 +338,9 @@ class AzSyncJobInfo:
     total_number_of_bytes_enumerated: int
     final_job_status_msg: str
     completed: bool
+    number_of_files_verified: int
+    number_of_files_reverified: int
+    verification_mismatches: List[str]
 
     def __init__(
         self,
@@ -274,6 +360,9 @@ class AzSyncJobInfo:
         total_number_of_bytes_enumerated: int = 0,
         final_job_status_msg: str = "",
         completed: bool = False,
+        number_of_files_verified: int = 0,
+        number_of_files_reverified: int = 0,
+        verification_mismatches: Optional[List[str]] = None,
     ) -> None:
         # NOTE: Sometimes, azcopy doesn't return value as 100%
         # even if the entire data is transferred.
@@ -298,3 +387,46 @@ class AzSyncJobInfo:
         self.total_number_of_bytes_transferred = total_number_of_bytes_transferred
         self.total_number_of_bytes_enumerated = total_number_of_bytes_enumerated
         self.completed = completed
+        # Filled by AzClient.verify_local_against_remote
+        self.number_of_files_verified = number_of_files_verified
+        # Files verified again after retransferring the mismatched files
+        self.number_of_files_reverified = number_of_files_reverified
+        self.verification_mismatches = verification_mismatches or []
+
+
+class AzTransferPlan:
+    """
+    Summary of the operations a copy or sync job would perform,
+    created from an azcopy dry run
+    """
+
+    number_of_transfers: int
+    number_of_deletions: int
+    total_bytes: int
+    largest_files: List[Tuple[str, int]]
+    files_per_prefix: Dict[str, int]
+    bytes_per_prefix: Dict[str, int]
+    throughput_bytes_per_second: Optional[float]
+    estimated_duration_seconds: Optional[float]
+
+    def __init__(
+        self,
+        number_of_transfers: int = 0,
+        number_of_deletions: int = 0,
+        total_bytes: int = 0,
+        largest_files: Optional[List[Tuple[str, int]]] = None,
+        files_per_prefix: Optional[Dict[str, int]] = None,
+        bytes_per_prefix: Optional[Dict[str, int]] = None,
+        throughput_bytes_per_second: Optional[float] = None,
+        estimated_duration_seconds: Optional[float] = None,
+    ) -> None:
+        # NOTE: The estimated duration is only available once a transfer
+        # to or from the same storage account has been measured
+        self.number_of_transfers = number_of_transfers
+        self.number_of_deletions = number_of_deletions
+        self.total_bytes = total_bytes
+        self.largest_files = largest_files or []
+        self.files_per_prefix = files_per_prefix or {}
+        self.bytes_per_prefix = bytes_per_prefix or {}
+        self.throughput_bytes_per_second = throughput_bytes_per_second
+        self.estimated_duration_seconds = estimated_duration_seconds
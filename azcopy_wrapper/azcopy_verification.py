@@ -0,0 +1,192 @@
+import base64
+import hashlib
+import mmap
+import os
+import re
+
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Dict, Generator, Iterable, List, Optional, Set, Tuple
+
+# Size of the slices of a memory mapped file passed to the hash function.
+# Large slices let hashlib release the GIL for most of the hashing time
+HASH_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Number of files hashed ahead per worker, so that the pending
+# work stays bounded when verifying millions of files
+PENDING_FILES_PER_WORKER = 64
+
+
+class AzRemoteFileInfo:
+    """
+    File entry returned by the azcopy list command
+    """
+
+    path: str
+    size: int
+    content_md5: str
+
+    def __init__(self, path: str = "", size: int = 0, content_md5: str = "") -> None:
+        self.path = path
+        self.size = size
+        self.content_md5 = content_md5
+
+
+def parse_list_output_line(output_line: str) -> Optional[AzRemoteFileInfo]:
+    """
+    Extracts the file entry from a line of the azcopy list output ->
+    INFO: {path};  Content Length: {size}; ContentMD5: {md5}
+    """
+    list_match = re.match(
+        r"INFO: (?P<path>.+?);\s+Content Length: (?P<size>\d+)(?P<properties>.*)$",
+        output_line.strip(),
+    )
+
+    if list_match is None:
+        return None
+
+    list_info = list_match.groupdict()
+
+    # Directory entries of accounts with hierarchical namespace
+    if list_info["path"].endswith("/"):
+        return None
+
+    md5_match = re.search(
+        r"ContentMD5: (?P<content_md5>[^;\s]*)", list_info["properties"]
+    )
+    content_md5 = md5_match.group("content_md5") if md5_match is not None else ""
+
+    return AzRemoteFileInfo(
+        path=list_info["path"],
+        size=int(list_info["size"]),
+        content_md5=content_md5,
+    )
+
+
+def hash_local_file(file_path: str) -> Tuple[int, str]:
+    """
+    Returns the size and the base64 encoded MD5 of a local file,
+    the same encoding azcopy uses for the Content-MD5 property
+    """
+    md5 = hashlib.md5()
+
+    with open(file_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+
+        # Empty files cannot be memory mapped
+        if file_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                mapped_view = memoryview(mapped_file)
+
+                try:
+                    for offset in range(0, file_size, HASH_BLOCK_SIZE):
+                        md5.update(mapped_view[offset : offset + HASH_BLOCK_SIZE])
+                finally:
+                    mapped_view.release()
+
+    return file_size, base64.b64encode(md5.digest()).decode()
+
+
+def iter_local_files(local_root: str) -> Generator[Tuple[str, str], None, None]:
+    """
+    Yields the relative path, with / as separator, and the
+    full path of all files under the local directory
+    """
+    for dir_path, _, file_names in os.walk(local_root):
+        for file_name in file_names:
+            file_path = os.path.join(dir_path, file_name)
+            relative_path = os.path.relpath(file_path, local_root)
+
+            yield relative_path.replace(os.sep, "/"), file_path
+
+
+def _is_matching(remote_file: AzRemoteFileInfo, file_path: str) -> bool:
+    # Skipping the hash when the size already differs
+    try:
+        if os.path.getsize(file_path) != remote_file.size:
+            return False
+    except OSError:
+        return False
+
+    # Blobs uploaded without --put-md5 can only be checked by size
+    if len(remote_file.content_md5) == 0:
+        return True
+
+    # Files which cannot be read, or were deleted since they were
+    # listed, are reported as mismatches instead of stopping the run
+    try:
+        _, local_md5 = hash_local_file(file_path)
+    except OSError:
+        return False
+
+    return local_md5 == remote_file.content_md5
+
+
+def find_mismatched_files(
+    remote_files: Dict[str, AzRemoteFileInfo],
+    local_files: Iterable[Tuple[str, str]],
+    max_workers: Optional[int] = None,
+    use_processes: bool = False,
+) -> Tuple[int, List[str]]:
+    """
+    Compares the local files against the size and Content-MD5 of the remote files
+    using a pool of workers, and returns the number of files verified and the
+    relative paths of the remote files that are missing or different locally
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    executor: Executor
+    if use_processes:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    max_pending = max_workers * PENDING_FILES_PER_WORKER
+    pending: Dict[Future, str] = {}
+    found_paths: Set[str] = set()
+    mismatched_files: List[str] = []
+    files_verified = 0
+
+    def collect(done: Iterable[Future]) -> None:
+        nonlocal files_verified
+
+        for future in done:
+            relative_path = pending.pop(future)
+            files_verified += 1
+
+            if not future.result():
+                mismatched_files.append(relative_path)
+
+    with executor:
+        for relative_path, file_path in local_files:
+            remote_file = remote_files.get(relative_path)
+
+            if remote_file is None:
+                continue
+
+            found_paths.add(relative_path)
+            pending[executor.submit(_is_matching, remote_file, file_path)] = (
+                relative_path
+            )
+
+            if len(pending) >= max_pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                collect(done)
+
+        done, _ = wait(list(pending))
+        collect(done)
+
+    # Remote files which do not exist locally
+    for relative_path in remote_files:
+        if relative_path not in found_paths:
+            files_verified += 1
+            mismatched_files.append(relative_path)
+
+    return files_verified, sorted(mismatched_files)
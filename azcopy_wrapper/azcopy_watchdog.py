@@ -0,0 +1,136 @@
+import datetime
+import re
+import subprocess
+import threading
+import time
+
+from typing import Optional
+
+from azcopy_wrapper.azcopy_utilities import AzWatchdogOptions
+
+# Status line sent by azcopy while a job runs ->
+# 45.5 %, 10 Done, 0 Failed, 20 Pending, 0 Skipped, 30 Total, 2-sec Throughput (Mb/s): 12.34
+STATUS_LINE_EXPRESSION = (
+    r"(?P<percent_complete>\d+\.\d+) %, (?P<done>\d+) Done"
+    r"(.*?(?P<total>\d+) Total)?"
+    r"(.*Throughput \(Mb/s\): (?P<throughput>\d+(\.\d+)?))?"
+)
+
+
+class AzJobWatchdog:
+    """
+    Watches the status lines of a running azcopy job and kills the job when
+    its progress stays flat, or its throughput stays below the minimum,
+    for longer than the stall window
+
+    The stall is recorded in stall_event so that the job can be resumed
+    """
+
+    options: AzWatchdogOptions
+    stall_event: Optional[dict]
+
+    def __init__(self, options: AzWatchdogOptions) -> None:
+        self.options = options
+        self.stall_event = None
+        self._popen: Optional[subprocess.Popen] = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._percent_complete = float(0)
+        self._done = 0
+        self._total = 0
+        self._throughput: Optional[float] = None
+        self._last_progress_time = time.monotonic()
+        self._last_healthy_throughput_time = time.monotonic()
+
+    def start(self, popen: subprocess.Popen) -> None:
+        self._popen = popen
+        self._last_progress_time = time.monotonic()
+        self._last_healthy_throughput_time = time.monotonic()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def observe(self, output_line: str) -> None:
+        """
+        Updates the progress from a line of the azcopy output
+        """
+        status_match = re.match(STATUS_LINE_EXPRESSION, output_line)
+
+        if status_match is None:
+            return
+
+        status_info = status_match.groupdict()
+        percent_complete = float(status_info["percent_complete"])
+        done = int(status_info["done"])
+        total = int(status_info["total"] or 0)
+        now = time.monotonic()
+
+        if percent_complete > self._percent_complete or done > self._done:
+            self._last_progress_time = now
+
+        # While azcopy scans a large source only the total grows,
+        # and nothing is transferred yet
+        if total > self._total:
+            self._last_progress_time = now
+            self._last_healthy_throughput_time = now
+
+        self._percent_complete = max(self._percent_complete, percent_complete)
+        self._done = max(self._done, done)
+        self._total = max(self._total, total)
+
+        if status_info["throughput"] is not None:
+            self._throughput = float(status_info["throughput"])
+
+            if (
+                self.options.min_throughput_mbps is None
+                or self._throughput >= self.options.min_throughput_mbps
+            ):
+                self._last_healthy_throughput_time = now
+
+    def _get_stall_reason(self, now: float) -> Optional[str]:
+        seconds_without_progress = now - self._last_progress_time
+
+        if seconds_without_progress >= self.options.stall_window_seconds:
+            return f"No progress for {int(seconds_without_progress)} seconds"
+
+        if self.options.min_throughput_mbps is not None:
+            seconds_below_minimum = now - self._last_healthy_throughput_time
+
+            if seconds_below_minimum >= self.options.stall_window_seconds:
+                return (
+                    f"Throughput below {self.options.min_throughput_mbps} Mb/s "
+                    f"for {int(seconds_below_minimum)} seconds"
+                )
+
+        return None
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.options.check_interval_seconds):
+            stall_reason = self._get_stall_reason(time.monotonic())
+
+            if stall_reason is None:
+                continue
+
+            # The job finished right before the check, there is nothing to stop
+            if self._popen is not None and self._popen.poll() is not None:
+                return
+
+            self.stall_event = {
+                "time": datetime.datetime.now(datetime.timezone.utc).strftime(
+                    "%Y-%m-%dT%H:%M:%SZ"
+                ),
+                "reason": stall_reason,
+                "percent_complete": self._percent_complete,
+                "throughput_mbps": self._throughput,
+            }
+
+            print(f"Stopping the stalled azcopy job -> {stall_reason}")
+
+            if self._popen is not None:
+                self._popen.kill()
+
+            return
@@ -0,0 +1,480 @@
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Dict, Generator, Optional, Union
+
+from azcopy_wrapper.azcopy_client import AzClient
+from azcopy_wrapper.azcopy_utilities import (
+    AzCopyJobInfo,
+    AzCopyOptions,
+    AzLocalLocation,
+    AzRemoteSASLocation,
+    AzSyncJobInfo,
+    AzSyncOptions,
+)
+
+
+class TaskStatus:
+    """
+    Status of a task in the work queue
+    """
+
+    PENDING = "pending"
+    LEASED = "leased"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+# Classes which can be stored in the work queue, by name
+SERIALIZABLE_CLASSES = {
+    cls.__name__: cls
+    for cls in [AzRemoteSASLocation, AzLocalLocation, AzCopyOptions, AzSyncOptions]
+}
+
+
+def _serialize(obj: object) -> str:
+    return json.dumps({"type": type(obj).__name__, "attributes": obj.__dict__})
+
+
+def _deserialize(text: str) -> object:
+    serialized = json.loads(text)
+
+    return SERIALIZABLE_CLASSES[serialized["type"]](**serialized["attributes"])
+
+
+class AzWorkTask:
+    """
+    Transfer task leased from the work queue
+    """
+
+    task_id: int
+    operation: str
+    src: Union[AzRemoteSASLocation, AzLocalLocation]
+    dest: Union[AzRemoteSASLocation, AzLocalLocation]
+    transfer_options: Union[AzCopyOptions, AzSyncOptions]
+    worker_id: str
+    attempts: int
+
+    def __init__(
+        self,
+        task_id: int,
+        operation: str,
+        src: Union[AzRemoteSASLocation, AzLocalLocation],
+        dest: Union[AzRemoteSASLocation, AzLocalLocation],
+        transfer_options: Union[AzCopyOptions, AzSyncOptions],
+        worker_id: str,
+        attempts: int,
+    ) -> None:
+        self.task_id = task_id
+        self.operation = operation
+        self.src = src
+        self.dest = dest
+        self.transfer_options = transfer_options
+        self.worker_id = worker_id
+        # The attempt number identifies the lease, so that a worker whose
+        # lease expired cannot update a task which was leased again
+        self.attempts = attempts
+
+
+class AzWorkQueue:
+    """
+    Durable queue of copy and sync tasks shared by several worker processes
+
+    The tasks are stored in a SQLite database, which handles the locking
+    between processes. Workers lease a task for lease_seconds and have to renew
+    the lease with heartbeat() while the transfer runs. Leases which are not
+    renewed, for ex. because the worker died, are reclaimed and the task is
+    given to another worker, up to max_attempts times.
+
+    The database uses write-ahead logging by default, so that reading the
+    queue does not block the workers leasing tasks.
+
+    NOTE: When the database is on a filesystem shared by several hosts,
+    use_wal has to be False since write-ahead logging needs the processes to
+    be on the same host, the filesystem needs to support the file locks used
+    by SQLite and the clocks of the hosts need to be synchronised. The SAS
+    tokens of the tasks are stored in the database, so it should only be
+    readable by the workers
+    """
+
+    db_path: str
+    lease_seconds: float
+    max_attempts: int
+
+    def __init__(
+        self,
+        db_path: str,
+        lease_seconds: float = 300,
+        max_attempts: int = 3,
+        use_wal: bool = True,
+    ) -> None:
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        if use_wal:
+            # The journal mode is stored in the database, so it
+            # only has to be set once, outside of a transaction
+            connection = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+            finally:
+                connection.close()
+
+        with self._transaction() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    operation TEXT NOT NULL,
+                    src TEXT NOT NULL,
+                    dest TEXT NOT NULL,
+                    transfer_options TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    worker_id TEXT,
+                    lease_expiry REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    job_info TEXT,
+                    error_msg TEXT
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, task_id)"
+            )
+
+    @contextmanager
+    def _transaction(
+        self, write: bool = True
+    ) -> Generator[sqlite3.Connection, None, None]:
+        """
+        Opens a connection and runs a transaction on it. A new connection
+        is used every time so that the queue can be shared by threads and
+        forked processes
+        """
+        connection = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+
+        try:
+            # Taking the write lock at the start of write transactions so that
+            # two workers can never lease the same task, while reads do not
+            # take it at all
+            connection.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def enqueue(
+        self,
+        src: Union[AzRemoteSASLocation, AzLocalLocation],
+        dest: Union[AzRemoteSASLocation, AzLocalLocation],
+        transfer_options: Union[AzCopyOptions, AzSyncOptions],
+    ) -> int:
+        """
+        Adds a copy or sync task, depending on the type of the
+        transfer options, and returns its id
+        """
+        operation = "sync" if isinstance(transfer_options, AzSyncOptions) else "copy"
+
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                """
+                INSERT INTO tasks (operation, src, dest, transfer_options, status)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    operation,
+                    _serialize(src),
+                    _serialize(dest),
+                    _serialize(transfer_options),
+                    TaskStatus.PENDING,
+                ),
+            )
+
+            return int(cursor.lastrowid)  # type: ignore
+
+    def _reclaim_expired_leases(self, connection: sqlite3.Connection) -> int:
+        now = time.time()
+
+        connection.execute(
+            """
+            UPDATE tasks SET status = ?, error_msg = ?
+            WHERE status = ? AND lease_expiry < ? AND attempts >= ?
+            """,
+            (
+                TaskStatus.FAILED,
+                "Lease expired on the last attempt",
+                TaskStatus.LEASED,
+                now,
+                self.max_attempts,
+            ),
+        )
+        cursor = connection.execute(
+            """
+            UPDATE tasks SET status = ?, worker_id = NULL, lease_expiry = NULL
+            WHERE status = ? AND lease_expiry < ?
+            """,
+            (TaskStatus.PENDING, TaskStatus.LEASED, now),
+        )
+
+        return cursor.rowcount
+
+    def reclaim_expired_leases(self) -> int:
+        """
+        Returns the tasks of workers which stopped renewing their lease to the
+        queue and returns the number of tasks reclaimed. This is also done
+        every time a task is leased
+        """
+        with self._transaction() as connection:
+            return self._reclaim_expired_leases(connection)
+
+    def lease(self, worker_id: str) -> Optional[AzWorkTask]:
+        """
+        Leases the oldest pending task to the worker, if there is one
+        """
+        with self._transaction() as connection:
+            self._reclaim_expired_leases(connection)
+
+            while True:
+                row = connection.execute(
+                    """
+                    SELECT task_id, operation, src, dest, transfer_options, attempts
+                    FROM tasks WHERE status = ? ORDER BY task_id LIMIT 1
+                    """,
+                    (TaskStatus.PENDING,),
+                ).fetchone()
+
+                if row is None:
+                    return None
+
+                task_id, operation, src, dest, transfer_options, attempts = row
+
+                try:
+                    task = AzWorkTask(
+                        task_id=task_id,
+                        operation=operation,
+                        src=_deserialize(src),  # type: ignore
+                        dest=_deserialize(dest),  # type: ignore
+                        transfer_options=_deserialize(transfer_options),  # type: ignore
+                        worker_id=worker_id,
+                        attempts=attempts + 1,
+                    )
+                except Exception as e:
+                    # Tasks which cannot be created anymore, for ex. because
+                    # their SAS token expired, are failed without retrying
+                    connection.execute(
+                        "UPDATE tasks SET status = ?, error_msg = ? WHERE task_id = ?",
+                        (TaskStatus.FAILED, str(e), task_id),
+                    )
+                    continue
+
+                connection.execute(
+                    """
+                    UPDATE tasks SET status = ?, worker_id = ?, lease_expiry = ?,
+                    attempts = ? WHERE task_id = ?
+                    """,
+                    (
+                        TaskStatus.LEASED,
+                        worker_id,
+                        time.time() + self.lease_seconds,
+                        task.attempts,
+                        task_id,
+                    ),
+                )
+
+                return task
+
+    def _update_leased_task(
+        self, task: AzWorkTask, assignments: str, values: tuple
+    ) -> bool:
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                f"""
+                UPDATE tasks SET {assignments}
+                WHERE task_id = ? AND status = ? AND worker_id = ? AND attempts = ?
+                """,
+                values
+                + (task.task_id, TaskStatus.LEASED, task.worker_id, task.attempts),
+            )
+
+            return cursor.rowcount == 1
+
+    def heartbeat(self, task: AzWorkTask) -> bool:
+        """
+        Renews the lease of the task. Returns False if the lease was lost,
+        in which case the task may already be running on another worker
+        """
+        return self._update_leased_task(
+            task, "lease_expiry = ?", (time.time() + self.lease_seconds,)
+        )
+
+    def complete(
+        self, task: AzWorkTask, job_info: Union[AzCopyJobInfo, AzSyncJobInfo]
+    ) -> bool:
+        """
+        Marks the task as completed and stores its job info
+        """
+        return self._update_leased_task(
+            task,
+            "status = ?, lease_expiry = NULL, job_info = ?",
+            (TaskStatus.COMPLETED, json.dumps(job_info.__dict__)),
+        )
+
+    def fail(self, task: AzWorkTask, error_msg: str) -> bool:
+        """
+        Returns the task to the queue to be retried, or marks it
+        as failed if it has been attempted max_attempts times
+        """
+        status = TaskStatus.PENDING
+        if task.attempts >= self.max_attempts:
+            status = TaskStatus.FAILED
+
+        return self._update_leased_task(
+            task,
+            "status = ?, worker_id = NULL, lease_expiry = NULL, error_msg = ?",
+            (status, error_msg),
+        )
+
+    def get_job_info(self, task_id: int) -> Optional[dict]:
+        """
+        Returns the job info reported for a completed task
+        """
+        with self._transaction(write=False) as connection:
+            row = connection.execute(
+                "SELECT job_info FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+
+        if row is None or row[0] is None:
+            return None
+
+        return json.loads(row[0])
+
+    def get_counts(self) -> Dict[str, int]:
+        """
+        Returns the number of tasks in each status
+        """
+        with self._transaction(write=False) as connection:
+            rows = connection.execute(
+                "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+            ).fetchall()
+
+        counts = {
+            TaskStatus.PENDING: 0,
+            TaskStatus.LEASED: 0,
+            TaskStatus.COMPLETED: 0,
+            TaskStatus.FAILED: 0,
+        }
+        counts.update(dict(rows))
+
+        return counts
+
+
+def get_default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_worker(
+    client: AzClient,
+    queue: AzWorkQueue,
+    worker_id: Optional[str] = None,
+    stop_when_empty: bool = True,
+    poll_interval: float = 5,
+) -> int:
+    """
+    Leases tasks from the queue and runs them with the AzClient until the queue
+    is empty, or forever if stop_when_empty is False. The lease is renewed in the
+    background while a transfer runs. Returns the number of tasks completed
+    """
+    if worker_id is None:
+        worker_id = get_default_worker_id()
+
+    tasks_completed = 0
+
+    while True:
+        task = queue.lease(worker_id)
+
+        if task is None:
+            counts = queue.get_counts()
+
+            # Waiting for the tasks of other workers, which are
+            # given back to the queue if their lease expires
+            if stop_when_empty and counts[TaskStatus.LEASED] == 0:
+                return tasks_completed
+
+            time.sleep(poll_interval)
+            continue
+
+        stop_heartbeat = threading.Event()
+        lease_lost = threading.Event()
+        running_job: Dict[str, subprocess.Popen] = {}
+
+        def keep_job(popen: subprocess.Popen) -> None:
+            running_job["popen"] = popen
+
+            # The lease may have been lost before azcopy started
+            if lease_lost.is_set():
+                popen.kill()
+
+        def renew_lease() -> None:
+            while not stop_heartbeat.wait(queue.lease_seconds / 3):
+                try:
+                    is_lease_renewed = queue.heartbeat(task)  # type: ignore
+                except Exception as e:
+                    # Retrying on the next interval, the lease
+                    # stays valid until it expires
+                    print(f"Error while renewing the lease -> {e}")
+                    continue
+
+                if not is_lease_renewed:
+                    # The task may already be running on another worker,
+                    # so the job is stopped to not transfer the data twice
+                    print(f"Lost the lease of task {task.task_id}")  # type: ignore
+                    lease_lost.set()
+
+                    if "popen" in running_job:
+                        running_job["popen"].kill()
+
+                    return
+
+        heartbeat_thread = threading.Thread(target=renew_lease, daemon=True)
+        heartbeat_thread.start()
+
+        try:
+            if task.operation == "sync":
+                job_info = client._sync(
+                    src=task.src,
+                    dest=task.dest,
+                    transfer_options=task.transfer_options,  # type: ignore
+                    on_start=keep_job,
+                )
+            else:
+                job_info = client._copy(
+                    src=task.src,
+                    dest=task.dest,
+                    transfer_options=task.transfer_options,  # type: ignore
+                    on_start=keep_job,
+                )
+        except Exception as e:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+            queue.fail(task, str(e))
+            continue
+
+        stop_heartbeat.set()
+        heartbeat_thread.join()
+
+        if queue.complete(task, job_info):
+            tasks_completed += 1
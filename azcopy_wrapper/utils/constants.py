@@ -2,3 +2,22 @@ import os
 
 DEFAULT_EXE_TO_USE = "azcopy"
 ARTEFACE_DIR = None  # type: ignore
+
+# Size of the chunks read from a source stream and piped to azcopy
+DEFAULT_STREAM_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Number of paths passed in a single --include-path option
+INCLUDE_PATH_BATCH_SIZE = 500
+
+# Time subtracted from the start of a sync when saving it as the watermark of the
+# next incremental sync, to cover the clock difference with the storage account
+SYNC_WATERMARK_SAFETY_MARGIN_SECONDS = 5 * 60
+
+# Default time after which an incremental sync runs a full sync again
+# to pick up files missed by the incremental copies and, when the sync
+# options delete the destination files, files deleted at the source
+DEFAULT_FULL_SYNC_INTERVAL_SECONDS = 24 * 60 * 60
+
+# Time given to a piped download to exit when its stream is closed,
+# before the download is considered stopped by the consumer
+PIPED_DOWNLOAD_EXIT_TIMEOUT_SECONDS = 2
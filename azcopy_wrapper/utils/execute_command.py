@@ -1,12 +1,16 @@
 import os
 import subprocess
+import threading
 
-from typing import List, Generator
+from typing import Callable, Generator, Iterable, List, Optional
 
 
-def execute_command(cmd: List[str]) -> Generator[str, None, None]:
+def execute_command(
+    cmd: List[str], on_start: Optional[Callable[[subprocess.Popen], None]] = None
+) -> Generator[str, None, None]:
     """
     Executes a command while simultaneously sending output.
+    on_start is called with the started process, for ex. to be able to stop it.
     """
     print(f"Executing command -> {' '.join(cmd)}")
 
@@ -18,6 +22,9 @@ def execute_command(cmd: List[str]) -> Generator[str, None, None]:
         env=os.environ.copy(),
     )
 
+    if on_start is not None:
+        on_start(popen)
+
     if popen.stdout is not None:
         for stdout_line in iter(popen.stdout.readline, ""):
             yield stdout_line
@@ -27,3 +34,96 @@ def execute_command(cmd: List[str]) -> Generator[str, None, None]:
 
         if return_code:
             raise subprocess.CalledProcessError(return_code, cmd)
+
+
+def execute_command_with_input(
+    cmd: List[str], input_chunks: Iterable[bytes]
+) -> Generator[str, None, None]:
+    """
+    Executes a command while feeding the input chunks to its stdin
+    and simultaneously sending output.
+
+    The chunks are written from a background thread. Writing to the pipe blocks
+    while the command is busy, so only one chunk is held in memory at a time.
+    """
+    print(f"Executing command -> {' '.join(cmd)}")
+
+    popen = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=os.environ.copy(),
+    )
+
+    input_errors: List[Exception] = []
+
+    def feed_input() -> None:
+        try:
+            for chunk in input_chunks:
+                popen.stdin.write(chunk)  # type: ignore
+        except BrokenPipeError:
+            # The command exited before reading all the input,
+            # its return code is checked below
+            pass
+        except Exception as e:
+            # Killing the command so that the partial input is not
+            # treated as a successfully completed transfer
+            input_errors.append(e)
+            popen.kill()
+        finally:
+            try:
+                popen.stdin.close()  # type: ignore
+            except BrokenPipeError:
+                pass
+
+    input_thread = threading.Thread(target=feed_input, daemon=True)
+    input_thread.start()
+
+    if popen.stdout is not None:
+        for stdout_line in iter(popen.stdout.readline, b""):
+            yield stdout_line.decode(errors="replace")
+
+        popen.stdout.close()
+
+    return_code = popen.wait()
+    input_thread.join()
+
+    if input_errors:
+        raise input_errors[0]
+
+    if return_code:
+        raise subprocess.CalledProcessError(return_code, cmd)
+
+
+def start_command_with_output_stream(cmd: List[str]) -> subprocess.Popen:
+    """
+    Starts a command whose stdout carries data instead of status messages.
+    The caller reads the data from stdout and the status from stderr.
+    """
+    print(f"Executing command -> {' '.join(cmd)}")
+
+    return subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=os.environ.copy(),
+    )
+
+
+def iter_command_status_lines(
+    popen: subprocess.Popen, cmd: List[str]
+) -> Generator[str, None, None]:
+    """
+    Sends the stderr output of a command started with start_command_with_output_stream
+    """
+    if popen.stderr is not None:
+        for stderr_line in iter(popen.stderr.readline, b""):
+            yield stderr_line.decode(errors="replace")
+
+        popen.stderr.close()
+
+    return_code = popen.wait()
+
+    if return_code:
+        raise subprocess.CalledProcessError(return_code, cmd)
@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import threading
+
+from contextlib import contextmanager
+from typing import Callable, Dict, Generator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where the state is
+    # only locked between the threads of a process
+    fcntl = None  # type: ignore
+
+
+class JsonStateStore:
+    """
+    Stores small pieces of client state, like measured throughput,
+    as JSON files in the artefact directory
+
+    Updates are locked between threads and, where fcntl is available,
+    between processes sharing the directory. If no directory is given,
+    the state is only kept in memory for the lifetime of the object
+    """
+
+    state_dir: Optional[str]
+
+    def __init__(self, state_dir: Optional[str] = None) -> None:
+        self.state_dir = state_dir
+        self._memory_state: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _get_state_path(self, name: str) -> str:
+        return os.path.join(str(self.state_dir), f"{name}.json")
+
+    @contextmanager
+    def _locked(self, name: str) -> Generator[None, None, None]:
+        with self._lock:
+            if self.state_dir is None or fcntl is None:
+                yield
+                return
+
+            os.makedirs(self.state_dir, exist_ok=True)
+
+            with open(self._get_state_path(name) + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def load(self, name: str) -> dict:
+        if self.state_dir is None:
+            return dict(self._memory_state.get(name, {}))
+
+        state_path = self._get_state_path(name)
+
+        if not os.path.exists(state_path):
+            return {}
+
+        with open(state_path) as f:
+            return json.load(f)
+
+    def _write(self, name: str, state: dict) -> None:
+        if self.state_dir is None:
+            self._memory_state[name] = dict(state)
+            return
+
+        os.makedirs(self.state_dir, exist_ok=True)
+
+        # Writing to a new temporary file first so that an interrupted
+        # write never leaves a corrupted state file behind
+        temp_fd, temp_path = tempfile.mkstemp(
+            dir=self.state_dir, prefix=f"{name}.", suffix=".tmp"
+        )
+
+        try:
+            with os.fdopen(temp_fd, "w") as f:
+                json.dump(state, f, indent=2, sort_keys=True)
+
+            os.replace(temp_path, self._get_state_path(name))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def save(self, name: str, state: dict) -> None:
+        with self._locked(name):
+            self._write(name, state)
+
+    def update(self, name: str, update_state: Callable[[dict], None]) -> dict:
+        """
+        Loads the state, changes it in place with update_state and saves it,
+        without other updates of the same state in between
+        """
+        with self._locked(name):
+            state = self.load(name)
+            update_state(state)
+            self._write(name, state)
+
+        return state
@@ -0,0 +1,58 @@
+import json
+import os
+import stat
+import sys
+
+import pytest
+
+from azcopy_wrapper.azcopy_utilities import AzRemoteSASLocation
+
+FAKE_AZCOPY_SCRIPT = os.path.join(os.path.dirname(__file__), "fake_azcopy.py")
+
+# Valid until 2099, so that the locations can be created in the tests
+SAS_TOKEN = "se=2099-01-01T00:00:00Z&sig=test"
+
+
+@pytest.fixture
+def fake_azcopy(tmp_path, monkeypatch) -> str:
+    """
+    Path of an executable which runs the fake azcopy,
+    storing the remote data under tmp_path/remote
+    """
+    exe_path = tmp_path / "azcopy"
+    exe_path.write_text(
+        f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_AZCOPY_SCRIPT}" "$@"\n'
+    )
+    exe_path.chmod(exe_path.stat().st_mode | stat.S_IEXEC)
+
+    monkeypatch.setenv("FAKE_AZCOPY_REMOTE_DIR", str(tmp_path / "remote"))
+    monkeypatch.setenv("FAKE_AZCOPY_LOG", str(tmp_path / "azcopy.log"))
+
+    return str(exe_path)
+
+
+@pytest.fixture
+def remote_dir(tmp_path) -> str:
+    """
+    Directory holding the data of the container "container" of the
+    storage account "account" for the fake azcopy
+    """
+    path = tmp_path / "remote" / "account" / "container"
+    path.mkdir(parents=True)
+
+    return str(path)
+
+
+def make_remote_location(path: str = "", **kwargs) -> AzRemoteSASLocation:
+    return AzRemoteSASLocation(
+        storage_account="account",
+        container="container",
+        path=path,
+        sas_token=SAS_TOKEN,
+        **kwargs,
+    )
+
+
+def read_azcopy_log(tmp_path) -> list:
+    with open(tmp_path / "azcopy.log") as f:
+        return [json.loads(line) for line in f]
@@ -0,0 +1,285 @@
+"""
+Fake azcopy used by the tests
+
+Remote locations are stored under FAKE_AZCOPY_REMOTE_DIR as
+{storage_account}/{container}/{path}. The behaviour of a run is
+controlled with the environment variables below
+"""
+import base64
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+from urllib.parse import urlparse
+
+REMOTE_DIR = os.environ.get("FAKE_AZCOPY_REMOTE_DIR", "")
+
+# Appends the arguments of every run to this file, one JSON list per line
+LOG_FILE = os.environ.get("FAKE_AZCOPY_LOG", "")
+
+# Copy jobs print their first status line and then stop
+# sending output for this many seconds before failing
+STALL_SECONDS = float(os.environ.get("FAKE_AZCOPY_STALL_SECONDS", "0"))
+
+# Copy jobs fail because the filters do not match any file
+NOTHING_SCHEDULED = os.environ.get("FAKE_AZCOPY_NOTHING_SCHEDULED", "") == "1"
+
+# Piped downloads send the first chunk and wait for this file to exist
+PIPE_RELEASE_FILE = os.environ.get("FAKE_AZCOPY_PIPE_RELEASE_FILE", "")
+
+# Piped downloads send the first chunk and then fail
+PIPE_FAIL = os.environ.get("FAKE_AZCOPY_PIPE_FAIL", "") == "1"
+
+JOB_ID = "0d9a1b7e-6a3c-4b8e-9f5e-2c1d3e4f5a6b"
+
+
+def get_remote_path(url: str) -> str:
+    parsed_url = urlparse(url)
+    storage_account = parsed_url.netloc.split(".")[0]
+    path = parsed_url.path.lstrip("/").rstrip("*")
+
+    return os.path.join(REMOTE_DIR, storage_account, *path.split("/"))
+
+
+def print_summary(bytes_transferred: int, files_transferred: int = 1) -> None:
+    print(
+        "100.0 %, {0} Done, 0 Failed, 0 Pending, 0 Skipped, {0} Total, "
+        "2-sec Throughput (Mb/s): 10.0".format(files_transferred)
+    )
+    print("")
+    print(f"Job {JOB_ID} summary")
+    print(f"Number of File Transfers: {files_transferred}")
+    print(f"Total Number of Transfers: {files_transferred}")
+    print(f"Number of Transfers Completed: {files_transferred}")
+    print("Number of Transfers Failed: 0")
+    print(f"TotalBytesTransferred: {bytes_transferred}")
+    print("Final Job Status: Completed")
+
+
+def pipe_upload(dest_url: str) -> None:
+    dest_path = get_remote_path(dest_url)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+    with open(dest_path, "wb") as f:
+        shutil.copyfileobj(sys.stdin.buffer, f)
+
+    print_summary(os.path.getsize(dest_path))
+
+
+def pipe_download(src_url: str) -> None:
+    with open(get_remote_path(src_url), "rb") as f:
+        first_chunk = f.read(1024)
+        sys.stdout.buffer.write(first_chunk)
+        sys.stdout.buffer.flush()
+
+        if PIPE_FAIL:
+            print("failed to read the blob: connection reset", file=sys.stderr)
+            sys.exit(1)
+
+        if PIPE_RELEASE_FILE:
+            wait_until = time.monotonic() + 5
+
+            while not os.path.exists(PIPE_RELEASE_FILE):
+                if time.monotonic() > wait_until:
+                    sys.exit(1)
+
+                time.sleep(0.05)
+
+        shutil.copyfileobj(f, sys.stdout.buffer)
+
+
+def copy(args: list) -> None:
+    if NOTHING_SCHEDULED:
+        print(
+            "failed to perform copy command due to error: no transfers were "
+            "scheduled because no files matched the specified criteria"
+        )
+        sys.exit(1)
+
+    print(f"Job {JOB_ID} has started")
+
+    if STALL_SECONDS > 0:
+        print(
+            "25.0 %, 1 Done, 0 Failed, 3 Pending, 0 Skipped, 4 Total, "
+            "2-sec Throughput (Mb/s): 10.0",
+            flush=True,
+        )
+        time.sleep(STALL_SECONDS)
+        sys.exit(1)
+
+    src, dest = args[1], args[2]
+    files_transferred = 0
+
+    # Downloads copy the remote files, other copies do not transfer anything
+    if src.startswith("https://") and not dest.startswith("https://"):
+        files_transferred = download(src, dest, get_option(args, "--include-path"))
+
+    print_summary(0, files_transferred=files_transferred)
+
+
+def get_option(args: list, name: str) -> str:
+    if name in args:
+        return args[args.index(name) + 1]
+
+    return ""
+
+
+def download(
+    src_url: str, dest: str, include_path: str, contents_only: bool = False
+) -> int:
+    """
+    Copies the remote data to the local destination with the same layout as
+    azcopy: the contents of the remote directory with a wildcard or for a
+    sync, or the remote directory itself without one
+    """
+    src_path = get_remote_path(src_url)
+
+    if os.path.isfile(src_path):
+        if os.path.isdir(dest):
+            dest = os.path.join(dest, os.path.basename(src_path))
+
+        shutil.copyfile(src_path, dest)
+        return 1
+
+    if not contents_only and not urlparse(src_url).path.endswith("*"):
+        dest = os.path.join(dest, os.path.basename(src_path.rstrip(os.sep)))
+
+    included_paths = set(include_path.split(";")) if include_path else None
+    files_transferred = 0
+
+    for dir_path, _, file_names in os.walk(src_path):
+        for file_name in file_names:
+            file_path = os.path.join(dir_path, file_name)
+            relative_path = os.path.relpath(file_path, src_path).replace(os.sep, "/")
+
+            if included_paths is not None and relative_path not in included_paths:
+                continue
+
+            dest_path = os.path.join(dest, *relative_path.split("/"))
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            shutil.copyfile(file_path, dest_path)
+            files_transferred += 1
+
+    return files_transferred
+
+
+def iter_files(location: str) -> list:
+    """
+    Returns the relative paths and sizes of the files in a local or remote location
+    """
+    if location.startswith("https://"):
+        root = get_remote_path(location)
+    else:
+        root = location.rstrip("*")
+
+    files = []
+
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in sorted(file_names):
+            file_path = os.path.join(dir_path, file_name)
+            relative_path = os.path.relpath(file_path, root).replace(os.sep, "/")
+            files.append((relative_path, os.path.getsize(file_path)))
+
+    return files
+
+
+def join_location(location: str, relative_path: str) -> str:
+    base, _, query = location.partition("?")
+    path = base.rstrip("*").rstrip("/") + "/" + relative_path
+
+    return path + "?" + query if query else path
+
+
+def dry_run(args: list) -> None:
+    """
+    Prints the planned operations as Dryrun messages without transferring
+    anything. A sync also plans to remove the files missing from the source
+    """
+    src, dest = args[1], args[2]
+    source_files = iter_files(src)
+    planned_operations = [
+        {
+            "EntityType": "File",
+            "Source": join_location(src, relative_path),
+            "Destination": join_location(dest, relative_path),
+            "SourceSize": size,
+        }
+        for relative_path, size in source_files
+    ]
+
+    if args[0] == "sync":
+        source_paths = {relative_path for relative_path, _ in source_files}
+        planned_operations += [
+            {"EntityType": "File", "Source": join_location(dest, relative_path)}
+            for relative_path, _ in iter_files(dest)
+            if relative_path not in source_paths
+        ]
+
+    for planned_operation in planned_operations:
+        message = {
+            "TimeStamp": "2026-10-19T10:00:00Z",
+            "MessageType": "Dryrun",
+            "MessageContent": json.dumps(planned_operation),
+        }
+        print(json.dumps(message))
+
+
+def list_files(url: str) -> None:
+    list_root = get_remote_path(url)
+
+    for dir_path, _, file_names in os.walk(list_root):
+        for file_name in sorted(file_names):
+            file_path = os.path.join(dir_path, file_name)
+
+            with open(file_path, "rb") as f:
+                content_md5 = base64.b64encode(hashlib.md5(f.read()).digest())
+
+            relative_path = os.path.relpath(file_path, list_root).replace(os.sep, "/")
+            file_size = os.path.getsize(file_path)
+            print(
+                f"INFO: {relative_path};  Content Length: {file_size}; "
+                f"ContentMD5: {content_md5.decode()}"
+            )
+
+
+def main() -> None:
+    args = sys.argv[1:]
+
+    if LOG_FILE:
+        with open(LOG_FILE, "a") as f:
+            f.write(json.dumps(args) + "\n")
+
+    if "--dry-run" in args:
+        dry_run(args)
+    elif args[0] == "cp" and "PipeBlob" in args:
+        pipe_upload(args[1])
+    elif args[0] == "cp" and "BlobPipe" in args:
+        pipe_download(args[1])
+    elif args[0] == "cp":
+        copy(args)
+    elif args[:2] == ["jobs", "resume"]:
+        print_summary(0, files_transferred=3)
+    elif args[0] == "list":
+        list_files(args[1])
+    elif args[0] == "sync":
+        if args[1].startswith("https://"):
+            download(args[1], args[2], "", contents_only=True)
+
+            if get_option(args, "--delete-destination") == "true":
+                source_paths = {path for path, _ in iter_files(args[1])}
+
+                for relative_path, _ in iter_files(args[2]):
+                    if relative_path not in source_paths:
+                        os.remove(os.path.join(args[2], *relative_path.split("/")))
+
+        print("Job {} Summary".format(JOB_ID))
+        print("Final Job Status: Completed")
+    else:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
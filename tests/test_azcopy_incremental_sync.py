@@ -0,0 +1,159 @@
+import os
+
+import pytest
+
+from azcopy_wrapper.azcopy_client import SYNC_WATERMARKS_STATE_NAME, AzClient
+from azcopy_wrapper.azcopy_utilities import (
+    AzCopyJobInfo,
+    AzCopyOptions,
+    AzLocalLocation,
+    AzSyncJobInfo,
+    AzSyncOptions,
+)
+from conftest import make_remote_location, read_azcopy_log
+
+
+def make_client(fake_azcopy: str, tmp_path) -> AzClient:
+    return AzClient(exe_to_use=fake_azcopy, artefact_dir=str(tmp_path / "artefacts"))
+
+
+def get_watermark(client: AzClient) -> dict:
+    sync_watermarks = client.state_store.load(SYNC_WATERMARKS_STATE_NAME)
+    assert len(sync_watermarks) == 1
+
+    return list(sync_watermarks.values())[0]
+
+
+def test_full_sync_then_incremental_copy(fake_azcopy, tmp_path):
+    client = make_client(fake_azcopy, tmp_path)
+    local_dir = tmp_path / "local"
+    local_dir.mkdir()
+
+    job_info = client.incremental_sync_to_local_location(
+        src=make_remote_location("data"),
+        dest=AzLocalLocation(str(local_dir)),
+        transfer_options=AzSyncOptions(recursive=True),
+    )
+    assert isinstance(job_info, AzSyncJobInfo)
+    watermark = get_watermark(client)
+
+    job_info = client.incremental_sync_to_local_location(
+        src=make_remote_location("data"),
+        dest=AzLocalLocation(str(local_dir)),
+        transfer_options=AzSyncOptions(recursive=True),
+    )
+    assert isinstance(job_info, AzCopyJobInfo)
+
+    sync_args, copy_args = read_azcopy_log(tmp_path)
+    assert sync_args[0] == "sync"
+    assert copy_args[0] == "cp"
+    assert copy_args[1].startswith(
+        "https://account.blob.core.windows.net/container/data/*?"
+    )
+    assert copy_args[-2:] == ["--include-after", watermark["last_sync_time"]]
+
+
+def test_incremental_copy_without_changes(fake_azcopy, tmp_path, monkeypatch):
+    client = make_client(fake_azcopy, tmp_path)
+    local_dir = tmp_path / "local"
+    local_dir.mkdir()
+
+    client.incremental_sync_to_local_location(
+        src=make_remote_location("data"),
+        dest=AzLocalLocation(str(local_dir)),
+        transfer_options=AzSyncOptions(recursive=True),
+    )
+
+    # Moving the watermark back to see it advance
+    old_sync_time = "2020-01-01T00:00:00Z"
+    watermark = get_watermark(client)
+    watermark["last_sync_time"] = old_sync_time
+    client.state_store.update(
+        SYNC_WATERMARKS_STATE_NAME,
+        lambda sync_watermarks: sync_watermarks.update(
+            {key: watermark for key in sync_watermarks}
+        ),
+    )
+
+    monkeypatch.setenv("FAKE_AZCOPY_NOTHING_SCHEDULED", "1")
+
+    job_info = client.incremental_sync_to_local_location(
+        src=make_remote_location("data"),
+        dest=AzLocalLocation(str(local_dir)),
+        transfer_options=AzSyncOptions(recursive=True),
+    )
+
+    assert isinstance(job_info, AzCopyJobInfo)
+    assert job_info.completed
+    assert job_info.error_msg == ""
+    assert job_info.number_of_transfers_completed == 0
+    assert get_watermark(client)["last_sync_time"] > old_sync_time
+
+
+def test_copy_without_matching_files_still_fails(fake_azcopy, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_AZCOPY_NOTHING_SCHEDULED", "1")
+
+    with pytest.raises(Exception):
+        make_client(fake_azcopy, tmp_path).download_data_to_local_location(
+            src=make_remote_location("data"),
+            dest=AzLocalLocation(str(tmp_path)),
+            transfer_options=AzCopyOptions(recursive=True),
+        )
+
+
+def test_full_sync_when_interval_elapsed(fake_azcopy, tmp_path):
+    client = make_client(fake_azcopy, tmp_path)
+    local_dir = tmp_path / "local"
+    local_dir.mkdir()
+
+    for _ in range(2):
+        client.incremental_sync_to_local_location(
+            src=make_remote_location("data"),
+            dest=AzLocalLocation(str(local_dir)),
+            transfer_options=AzSyncOptions(recursive=True),
+            full_sync_interval_seconds=0,
+        )
+
+    assert [args[0] for args in read_azcopy_log(tmp_path)] == ["sync", "sync"]
+
+
+def test_incremental_copy_is_recursive_like_the_sync(fake_azcopy, tmp_path):
+    client = make_client(fake_azcopy, tmp_path)
+    local_dir = tmp_path / "local"
+    local_dir.mkdir()
+
+    # azcopy sync recurses without --recursive, so the copy has to as well
+    for _ in range(2):
+        client.incremental_sync_to_local_location(
+            src=make_remote_location("data"),
+            dest=AzLocalLocation(str(local_dir)),
+            transfer_options=AzSyncOptions(),
+        )
+
+    sync_args, copy_args = read_azcopy_log(tmp_path)
+    assert "--recursive" not in sync_args
+    assert "--recursive" in copy_args
+
+
+def test_full_sync_deletes_destination_files(fake_azcopy, remote_dir, tmp_path):
+    os.makedirs(os.path.join(remote_dir, "data"))
+    with open(os.path.join(remote_dir, "data", "kept.txt"), "wb") as f:
+        f.write(b"kept")
+
+    client = make_client(fake_azcopy, tmp_path)
+    local_dir = tmp_path / "local"
+    local_dir.mkdir()
+    (local_dir / "deleted.txt").write_bytes(b"deleted at the source")
+
+    for _ in range(2):
+        client.incremental_sync_to_local_location(
+            src=make_remote_location("data"),
+            dest=AzLocalLocation(str(local_dir)),
+            transfer_options=AzSyncOptions(delete_destination=True),
+        )
+
+    sync_args, copy_args = read_azcopy_log(tmp_path)
+    assert sync_args[-2:] == ["--delete-destination", "true"]
+    # cp does not support deleting destination files
+    assert "--delete-destination" not in copy_args
+    assert os.listdir(str(local_dir)) == ["kept.txt"]
@@ -0,0 +1,227 @@
+import json
+import multiprocessing
+import os
+import threading
+
+from azcopy_wrapper.azcopy_client import AzClient
+from azcopy_wrapper.azcopy_plan import (
+    THROUGHPUT_STATE_NAME,
+    AzTransferPlanner,
+    get_throughput,
+    parse_dry_run_line,
+    record_throughput,
+)
+from azcopy_wrapper.azcopy_utilities import (
+    AzCopyOptions,
+    AzLocalLocation,
+    AzSyncOptions,
+)
+from azcopy_wrapper.utils.state_store import JsonStateStore
+from conftest import make_remote_location, read_azcopy_log
+
+
+def dry_run_line(message_content: str) -> str:
+    return json.dumps(
+        {
+            "TimeStamp": "2026-10-19T10:00:00Z",
+            "MessageType": "Dryrun",
+            "MessageContent": message_content,
+        }
+    )
+
+
+def test_parse_dry_run_line_copy():
+    transfer = json.dumps(
+        {
+            "EntityType": "File",
+            "FromTo": "LocalBlob",
+            "Source": "/data/a.txt",
+            "Destination": "https://account.blob.core.windows.net/container/a.txt",
+            "SourceSize": 42,
+        }
+    )
+
+    assert parse_dry_run_line(dry_run_line(transfer)) == ("copy", "/data/a.txt", 42)
+
+
+def test_parse_dry_run_line_sync_deletion():
+    transfer = json.dumps({"EntityType": "File", "Source": "/data/old.txt"})
+
+    assert parse_dry_run_line(dry_run_line(transfer)) == (
+        "remove",
+        "/data/old.txt",
+        None,
+    )
+
+
+def test_parse_dry_run_line_text_content():
+    assert parse_dry_run_line(
+        dry_run_line("DRYRUN: copy /data/a to b.txt to https://account/c/a.txt")
+    ) == ("copy", "/data/a to b.txt", None)
+    assert parse_dry_run_line(dry_run_line("DRYRUN: remove /data/old.txt")) == (
+        "remove",
+        "/data/old.txt",
+        None,
+    )
+
+
+def test_parse_dry_run_line_skips_other_lines():
+    assert parse_dry_run_line("INFO: Scanning...") is None
+    assert parse_dry_run_line(json.dumps({"MessageType": "Info"})) is None
+    assert parse_dry_run_line(json.dumps([1, 2])) is None
+
+
+def test_transfer_planner_summary():
+    planner = AzTransferPlanner(
+        "https://account/container/root/", largest_files_count=2
+    )
+
+    planner.add("copy", "https://account/container/root/a/1.bin", 100)
+    planner.add("copy", "https://account/container/root/a/2.bin", 300)
+    planner.add("copy", "https://account/container/root/b/3.bin", 200)
+    planner.add("copy", "https://account/container/root/top.bin", 50)
+    planner.add("remove", "https://account/container/root/old.bin", None)
+
+    plan = planner.get_plan(throughput=65)
+
+    assert plan.number_of_transfers == 4
+    assert plan.number_of_deletions == 1
+    assert plan.total_bytes == 650
+    assert plan.largest_files == [("a/2.bin", 300), ("b/3.bin", 200)]
+    assert plan.files_per_prefix == {"a": 2, "b": 1, ".": 1}
+    assert plan.bytes_per_prefix == {"a": 400, "b": 200, ".": 50}
+    assert plan.estimated_duration_seconds == 10
+
+
+def test_record_throughput_moving_average():
+    state_store = JsonStateStore()
+
+    record_throughput(state_store, "account", 1000, 10)
+    record_throughput(state_store, "account", 2000, 10)
+    # Too short to be measured
+    record_throughput(state_store, "account", 1000000, 1)
+
+    assert get_throughput(state_store, "account") == 0.3 * 200 + 0.7 * 100
+
+
+def test_record_throughput_from_many_threads(tmp_path):
+    state_dir = str(tmp_path / "state")
+
+    def record(thread_number: int) -> None:
+        state_store = JsonStateStore(state_dir)
+
+        for _ in range(50):
+            record_throughput(state_store, f"account{thread_number}", 1000, 10)
+
+    threads = [threading.Thread(target=record, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    throughput_history = JsonStateStore(state_dir).load(THROUGHPUT_STATE_NAME)
+
+    assert throughput_history == {f"account{i}": 100 for i in range(8)}
+    assert not [name for name in os.listdir(state_dir) if name.endswith(".tmp")]
+
+
+def increment_counter(state_dir: str) -> None:
+    state_store = JsonStateStore(state_dir)
+
+    def increment(state: dict) -> None:
+        state["count"] = state.get("count", 0) + 1
+
+    for _ in range(50):
+        state_store.update("counter", increment)
+
+
+def test_state_store_update_from_many_processes(tmp_path):
+    state_dir = str(tmp_path / "state")
+
+    processes = [
+        multiprocessing.Process(target=increment_counter, args=(state_dir,))
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert JsonStateStore(state_dir).load("counter") == {"count": 200}
+
+
+def test_record_throughput_with_corrupted_state(tmp_path):
+    state_dir = tmp_path / "state"
+    state_dir.mkdir()
+    (state_dir / f"{THROUGHPUT_STATE_NAME}.json").write_text("{not json")
+
+    # Only printed, the measured job is not failed
+    record_throughput(JsonStateStore(str(state_dir)), "account", 1000, 10)
+
+
+def test_get_throughput_with_corrupted_state(tmp_path):
+    state_dir = tmp_path / "state"
+    state_dir.mkdir()
+    (state_dir / f"{THROUGHPUT_STATE_NAME}.json").write_text("{not json")
+
+    assert get_throughput(JsonStateStore(str(state_dir)), "account") is None
+
+
+def write_file(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_plan_upload_without_sending_data(fake_azcopy, remote_dir, tmp_path):
+    local_dir = tmp_path / "local"
+    write_file(str(local_dir / "a" / "1.bin"), b"x" * 300)
+    write_file(str(local_dir / "a" / "2.bin"), b"x" * 100)
+    write_file(str(local_dir / "top.bin"), b"x" * 50)
+
+    client = AzClient(exe_to_use=fake_azcopy)
+    plan = client.plan(
+        src=AzLocalLocation(str(local_dir), use_wildcard=True),
+        dest=make_remote_location("data"),
+        transfer_options=AzCopyOptions(recursive=True),
+        largest_files_count=2,
+    )
+
+    upload_args = read_azcopy_log(tmp_path)[-1]
+    assert upload_args[:2] == ["cp", str(local_dir) + "*"]
+    assert upload_args[2].startswith(
+        "https://account.blob.core.windows.net/container/data?"
+    )
+    assert upload_args[3:7] == ["--dry-run", "--output-type", "json", "--recursive"]
+    assert plan.number_of_transfers == 3
+    assert plan.number_of_deletions == 0
+    assert plan.total_bytes == 450
+    assert plan.largest_files == [("a/1.bin", 300), ("a/2.bin", 100)]
+    assert plan.files_per_prefix == {"a": 2, ".": 1}
+    assert plan.bytes_per_prefix == {"a": 400, ".": 50}
+    assert plan.estimated_duration_seconds is None
+    assert not os.path.exists(os.path.join(remote_dir, "data"))
+
+
+def test_plan_sync_with_deletions(fake_azcopy, remote_dir, tmp_path):
+    write_file(os.path.join(remote_dir, "data", "a", "1.bin"), b"x" * 300)
+    write_file(os.path.join(remote_dir, "data", "top.bin"), b"x" * 50)
+    local_dir = tmp_path / "local"
+    write_file(str(local_dir / "stale.bin"), b"x")
+
+    client = AzClient(exe_to_use=fake_azcopy)
+    plan = client.plan(
+        src=make_remote_location("data"),
+        dest=AzLocalLocation(str(local_dir)),
+        transfer_options=AzSyncOptions(),
+    )
+
+    sync_args = read_azcopy_log(tmp_path)[-1]
+    assert sync_args[0] == "sync"
+    assert sync_args[3:6] == ["--dry-run", "--output-type", "json"]
+    assert plan.number_of_transfers == 2
+    assert plan.number_of_deletions == 1
+    assert plan.files_per_prefix == {"a": 1, ".": 1}
+    assert plan.bytes_per_prefix == {"a": 300, ".": 50}
+    assert os.listdir(str(local_dir)) == ["stale.bin"]
@@ -0,0 +1,105 @@
+import io
+import os
+
+import pytest
+
+from azcopy_wrapper.azcopy_client import AzClient
+from azcopy_wrapper.azcopy_utilities import AzCopyOptions
+from conftest import make_remote_location
+
+
+def test_download_stream_round_trip(fake_azcopy, remote_dir):
+    data = os.urandom(2 * 1024 * 1024 + 5)
+    client = AzClient(exe_to_use=fake_azcopy)
+
+    client.upload_stream(
+        src=io.BytesIO(data),
+        dest=make_remote_location("round_trip.bin"),
+        transfer_options=AzCopyOptions(),
+    )
+
+    with client.download_stream(
+        src=make_remote_location("round_trip.bin"),
+        transfer_options=AzCopyOptions(),
+        chunk_size=64 * 1024,
+    ) as stream:
+        downloaded = b"".join(bytes(chunk) for chunk in stream.iter_chunks())
+
+    assert downloaded == data
+    assert stream.job_info is not None
+    assert stream.job_info.completed
+    assert stream.job_info.total_bytes_transferred == len(data)
+
+
+def test_download_stream_returns_data_while_downloading(
+    fake_azcopy, remote_dir, tmp_path, monkeypatch
+):
+    with open(os.path.join(remote_dir, "slow.bin"), "wb") as f:
+        f.write(b"a" * 1024 + b"b" * 1024)
+
+    # The fake azcopy only sends the rest of the data once the
+    # first chunk has been received, and fails after 5 seconds
+    release_file = tmp_path / "release"
+    monkeypatch.setenv("FAKE_AZCOPY_PIPE_RELEASE_FILE", str(release_file))
+
+    with AzClient(exe_to_use=fake_azcopy).download_stream(
+        src=make_remote_location("slow.bin"), transfer_options=AzCopyOptions()
+    ) as stream:
+        chunks = stream.iter_chunks()
+        first_chunk = bytes(next(chunks))
+        release_file.touch()
+        rest = b"".join(bytes(chunk) for chunk in chunks)
+
+    assert first_chunk == b"a" * 1024
+    assert rest == b"b" * 1024
+    assert stream.job_info.completed  # type: ignore
+
+
+def test_download_stream_closed_early(fake_azcopy, remote_dir):
+    with open(os.path.join(remote_dir, "large.bin"), "wb") as f:
+        f.write(os.urandom(8 * 1024 * 1024))
+
+    stream = AzClient(exe_to_use=fake_azcopy).download_stream(
+        src=make_remote_location("large.bin"), transfer_options=AzCopyOptions()
+    )
+    stream.read(10)
+    stream.close()
+
+    assert stream.job_info is not None
+    assert not stream.job_info.completed
+
+
+def test_download_stream_closed_after_reading_all_data(fake_azcopy, remote_dir):
+    with open(os.path.join(remote_dir, "small.bin"), "wb") as f:
+        f.write(b"abc")
+
+    # Reading exactly the size of the blob does not reach the end of the data
+    with AzClient(exe_to_use=fake_azcopy).download_stream(
+        src=make_remote_location("small.bin"), transfer_options=AzCopyOptions()
+    ) as stream:
+        assert stream.read(3) == b"abc"
+
+    assert stream.job_info is not None
+    assert stream.job_info.completed
+    assert stream.job_info.error_msg == ""
+
+
+def test_download_stream_failing_mid_stream(fake_azcopy, remote_dir, monkeypatch):
+    with open(os.path.join(remote_dir, "broken.bin"), "wb") as f:
+        f.write(os.urandom(4096))
+
+    monkeypatch.setenv("FAKE_AZCOPY_PIPE_FAIL", "1")
+
+    stream = AzClient(exe_to_use=fake_azcopy).download_stream(
+        src=make_remote_location("broken.bin"), transfer_options=AzCopyOptions()
+    )
+    chunks = stream.iter_chunks()
+
+    # The data received before the failure is returned,
+    # the failure is raised from the read reaching the end
+    assert len(bytes(next(chunks))) == 1024
+
+    with pytest.raises(Exception, match="Error while transferring data"):
+        next(chunks)
+
+    stream.close()
@@ -0,0 +1,75 @@
+import io
+import os
+
+import pytest
+
+from azcopy_wrapper.azcopy_client import AzClient
+from azcopy_wrapper.azcopy_stream import iter_data_chunks
+from azcopy_wrapper.azcopy_utilities import AzCopyOptions
+from conftest import make_remote_location
+
+
+def test_upload_stream_from_file_object(fake_azcopy, remote_dir):
+    data = os.urandom(3 * 1024 * 1024 + 17)
+
+    job_info = AzClient(exe_to_use=fake_azcopy).upload_stream(
+        src=io.BytesIO(data),
+        dest=make_remote_location("upload.bin"),
+        transfer_options=AzCopyOptions(),
+        chunk_size=1024 * 1024,
+    )
+
+    assert job_info.completed
+    assert job_info.total_bytes_transferred == len(data)
+
+    with open(os.path.join(remote_dir, "upload.bin"), "rb") as f:
+        assert f.read() == data
+
+
+def test_upload_stream_from_iterable(fake_azcopy, remote_dir):
+    chunks = [b"first,", b"", b"second,", b"third"]
+
+    AzClient(exe_to_use=fake_azcopy).upload_stream(
+        src=iter(chunks),
+        dest=make_remote_location("upload.txt"),
+        transfer_options=AzCopyOptions(),
+    )
+
+    with open(os.path.join(remote_dir, "upload.txt"), "rb") as f:
+        assert f.read() == b"first,second,third"
+
+
+def test_upload_stream_from_bytes(fake_azcopy, remote_dir):
+    job_info = AzClient(exe_to_use=fake_azcopy).upload_stream(
+        src=b"in-memory data",
+        dest=make_remote_location("upload.txt"),
+        transfer_options=AzCopyOptions(),
+    )
+
+    assert job_info.total_bytes_transferred == len(b"in-memory data")
+
+    with open(os.path.join(remote_dir, "upload.txt"), "rb") as f:
+        assert f.read() == b"in-memory data"
+
+
+@pytest.mark.parametrize("data", [b"abcdefg", bytearray(b"abcdefg")])
+def test_iter_data_chunks_from_bytes(data):
+    assert [bytes(chunk) for chunk in iter_data_chunks(data, chunk_size=3)] == [
+        b"abc",
+        b"def",
+        b"g",
+    ]
+
+
+def test_upload_stream_fails_when_source_fails(fake_azcopy, remote_dir):
+    def failing_source():
+        yield b"partial"
+        raise ValueError("export failed")
+
+    # The partial data is not reported as a completed upload
+    with pytest.raises(Exception):
+        AzClient(exe_to_use=fake_azcopy).upload_stream(
+            src=failing_source(),
+            dest=make_remote_location("partial.txt"),
+            transfer_options=AzCopyOptions(),
+        )
@@ -0,0 +1,206 @@
+import os
+
+import pytest
+
+from azcopy_wrapper import azcopy_verification
+from azcopy_wrapper.azcopy_client import AzClient
+from azcopy_wrapper.azcopy_utilities import (
+    AzCopyOptions,
+    AzLocalLocation,
+    AzSyncOptions,
+    TransferLayout,
+)
+from azcopy_wrapper.azcopy_verification import (
+    AzRemoteFileInfo,
+    find_mismatched_files,
+    hash_local_file,
+    parse_list_output_line,
+)
+from conftest import make_remote_location, read_azcopy_log
+
+
+def write_file(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_parse_list_output_line():
+    remote_file = parse_list_output_line(
+        "INFO: dir/a.txt;  Content Length: 5; ContentMD5: XUFAKrxLKna5cZ2REBfFkg==\n"
+    )
+
+    assert remote_file is not None
+    assert remote_file.path == "dir/a.txt"
+    assert remote_file.size == 5
+    assert remote_file.content_md5 == "XUFAKrxLKna5cZ2REBfFkg=="
+
+
+def test_parse_list_output_line_without_md5():
+    remote_file = parse_list_output_line("INFO: a.txt;  Content Length: 5\n")
+
+    assert remote_file is not None
+    assert remote_file.content_md5 == ""
+
+
+def test_parse_list_output_line_skips_other_lines():
+    assert parse_list_output_line("INFO: dir/;  Content Length: 0\n") is None
+    assert parse_list_output_line("File count: 2\n") is None
+
+
+def test_hash_local_file_matches_azcopy_encoding(tmp_path):
+    write_file(str(tmp_path / "hello.txt"), b"hello")
+    write_file(str(tmp_path / "empty.txt"), b"")
+
+    assert hash_local_file(str(tmp_path / "hello.txt")) == (
+        5,
+        "XUFAKrxLKna5cZ2REBfFkg==",
+    )
+    assert hash_local_file(str(tmp_path / "empty.txt")) == (
+        0,
+        "1B2M2Y8AsgTpgAmY7PhCfg==",
+    )
+
+
+def test_find_mismatched_files(tmp_path):
+    write_file(str(tmp_path / "same.txt"), b"hello")
+    write_file(str(tmp_path / "changed.txt"), b"HELLO")
+    write_file(str(tmp_path / "resized.txt"), b"hello!")
+    write_file(str(tmp_path / "no_md5.txt"), b"12345")
+
+    remote_files = {
+        "same.txt": AzRemoteFileInfo("same.txt", 5, "XUFAKrxLKna5cZ2REBfFkg=="),
+        "changed.txt": AzRemoteFileInfo("changed.txt", 5, "XUFAKrxLKna5cZ2REBfFkg=="),
+        "resized.txt": AzRemoteFileInfo("resized.txt", 5, "XUFAKrxLKna5cZ2REBfFkg=="),
+        "no_md5.txt": AzRemoteFileInfo("no_md5.txt", 5, ""),
+        "missing.txt": AzRemoteFileInfo("missing.txt", 5, ""),
+    }
+    local_files = [
+        (name, str(tmp_path / name)) for name in sorted(os.listdir(tmp_path))
+    ]
+
+    files_verified, mismatches = find_mismatched_files(
+        remote_files, local_files, max_workers=2
+    )
+
+    assert files_verified == 5
+    assert mismatches == ["changed.txt", "missing.txt", "resized.txt"]
+
+
+def test_find_mismatched_files_with_unreadable_file(tmp_path, monkeypatch):
+    write_file(str(tmp_path / "a.txt"), b"hello")
+    write_file(str(tmp_path / "b.txt"), b"hello")
+
+    def hash_or_fail(file_path: str):
+        if file_path.endswith("a.txt"):
+            raise PermissionError(file_path)
+
+        return hash_local_file(file_path)
+
+    monkeypatch.setattr(azcopy_verification, "hash_local_file", hash_or_fail)
+
+    remote_files = {
+        name: AzRemoteFileInfo(name, 5, "XUFAKrxLKna5cZ2REBfFkg==")
+        for name in ["a.txt", "b.txt"]
+    }
+    local_files = [(name, str(tmp_path / name)) for name in remote_files]
+
+    assert find_mismatched_files(remote_files, local_files) == (2, ["a.txt"])
+
+
+def test_verify_and_retransfer_downloaded_directory(fake_azcopy, remote_dir, tmp_path):
+    write_file(os.path.join(remote_dir, "data", "a.txt"), b"a")
+    write_file(os.path.join(remote_dir, "data", "sub", "b.txt"), b"b")
+    write_file(os.path.join(remote_dir, "data", "c.txt"), b"c")
+
+    client = AzClient(exe_to_use=fake_azcopy)
+    local_dir = tmp_path / "local"
+    local_dir.mkdir()
+
+    # Without a wildcard the remote directory is created in the local directory
+    client.download_data_to_local_location(
+        src=make_remote_location("data"),
+        dest=AzLocalLocation(str(local_dir)),
+        transfer_options=AzCopyOptions(recursive=True),
+    )
+    write_file(str(local_dir / "data" / "sub" / "b.txt"), b"B")
+    os.remove(str(local_dir / "data" / "c.txt"))
+
+    job_info = client.verify_local_against_remote(
+        remote=make_remote_location("data"), local=AzLocalLocation(str(local_dir))
+    )
+
+    assert job_info.number_of_files_verified == 3
+    assert job_info.verification_mismatches == ["c.txt", "sub/b.txt"]
+
+    job_info = client.verify_local_against_remote(
+        remote=make_remote_location("data"),
+        local=AzLocalLocation(str(local_dir)),
+        retransfer_mismatches=True,
+    )
+
+    assert job_info.number_of_files_verified == 3
+    assert job_info.number_of_files_reverified == 2
+    assert job_info.verification_mismatches == []
+
+    # Only the mismatched files are transferred again, into the same layout
+    retransfer_args = read_azcopy_log(tmp_path)[-1]
+    assert retransfer_args[1].startswith(
+        "https://account.blob.core.windows.net/container/data/*?"
+    )
+    assert retransfer_args[2] == str(local_dir / "data")
+    assert retransfer_args[-1] == "c.txt;sub/b.txt"
+    assert sorted(os.listdir(local_dir)) == ["data"]
+
+
+def test_verify_after_sync_uses_sync_layout(fake_azcopy, remote_dir, tmp_path):
+    write_file(os.path.join(remote_dir, "data", "a.txt"), b"a")
+    write_file(os.path.join(remote_dir, "data", "sub", "b.txt"), b"b")
+
+    client = AzClient(exe_to_use=fake_azcopy)
+    local_dir = tmp_path / "local"
+    local_dir.mkdir()
+
+    # A sync puts the contents of the remote directory in the local directory
+    sync_job_info = client.sync_to_local_location(
+        src=make_remote_location("data"),
+        dest=AzLocalLocation(str(local_dir)),
+        transfer_options=AzSyncOptions(),
+    )
+    assert sorted(os.listdir(local_dir)) == ["a.txt", "sub"]
+    write_file(str(local_dir / "sub" / "b.txt"), b"B")
+
+    job_info = client.verify_local_against_remote(
+        remote=make_remote_location("data"),
+        local=AzLocalLocation(str(local_dir)),
+        job_info=sync_job_info,
+        retransfer_mismatches=True,
+    )
+
+    assert job_info is sync_job_info
+    assert job_info.number_of_files_verified == 2
+    assert job_info.number_of_files_reverified == 1
+    assert job_info.verification_mismatches == []
+    assert read_azcopy_log(tmp_path)[-1][2] == str(local_dir)
+    assert sorted(os.listdir(local_dir)) == ["a.txt", "sub"]
+
+
+def test_verify_refuses_retransfer_with_wrong_layout(
+    fake_azcopy, remote_dir, tmp_path
+):
+    write_file(os.path.join(remote_dir, "data", "a.txt"), b"a")
+    write_file(str(tmp_path / "local" / "a.txt"), b"a")
+
+    client = AzClient(exe_to_use=fake_azcopy)
+
+    with pytest.raises(Exception, match="None of the remote files were found"):
+        client.verify_local_against_remote(
+            remote=make_remote_location("data"),
+            local=AzLocalLocation(str(tmp_path / "local")),
+            retransfer_mismatches=True,
+            layout=TransferLayout.COPY,
+        )
+
+    # Nothing is written next to the data that was synced
+    assert os.listdir(str(tmp_path / "local")) == ["a.txt"]
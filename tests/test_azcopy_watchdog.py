@@ -0,0 +1,135 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from azcopy_wrapper.azcopy_client import AzClient
+from azcopy_wrapper.azcopy_utilities import (
+    AzCopyOptions,
+    AzLocalLocation,
+    AzWatchdogOptions,
+)
+from azcopy_wrapper.azcopy_watchdog import AzJobWatchdog
+from conftest import SAS_TOKEN, make_remote_location, read_azcopy_log
+
+
+def status_line(percent_complete: float, done: int, total: int) -> str:
+    return (
+        f"{percent_complete:.1f} %, {done} Done, 0 Failed, {total - done} Pending, "
+        f"0 Skipped, {total} Total, 2-sec Throughput (Mb/s): 0\n"
+    )
+
+
+def test_watchdog_progress_from_status_lines():
+    watchdog = AzJobWatchdog(AzWatchdogOptions(stall_window_seconds=60))
+
+    watchdog.observe(status_line(0, 0, 10))
+    scan_time = watchdog._last_progress_time
+
+    # A growing total while scanning the source is progress
+    time.sleep(0.01)
+    watchdog.observe(status_line(0, 0, 20))
+    assert watchdog._last_progress_time > scan_time
+
+    transfer_time = watchdog._last_progress_time
+    time.sleep(0.01)
+    watchdog.observe(status_line(50, 10, 20))
+    assert watchdog._last_progress_time > transfer_time
+
+    # The same status again is not progress
+    flat_time = watchdog._last_progress_time
+    time.sleep(0.01)
+    watchdog.observe(status_line(50, 10, 20))
+    watchdog.observe("INFO: Some other output\n")
+    assert watchdog._last_progress_time == flat_time
+
+    assert watchdog._get_stall_reason(flat_time + 59) is None
+    assert watchdog._get_stall_reason(flat_time + 61) is not None
+
+
+def test_watchdog_minimum_throughput():
+    watchdog = AzJobWatchdog(
+        AzWatchdogOptions(stall_window_seconds=60, min_throughput_mbps=5)
+    )
+
+    watchdog.observe(status_line(10, 1, 10))
+    low_throughput_time = watchdog._last_healthy_throughput_time
+
+    time.sleep(0.01)
+    watchdog.observe(status_line(20, 2, 10))
+
+    # Progress is made, but below the minimum throughput
+    assert watchdog._last_progress_time > low_throughput_time
+    assert watchdog._last_healthy_throughput_time == low_throughput_time
+
+    watchdog._last_progress_time = low_throughput_time + 30
+    reason = watchdog._get_stall_reason(low_throughput_time + 61)
+    assert reason is not None
+    assert "Throughput below" in reason
+
+
+def test_watchdog_ignores_finished_process():
+    watchdog = AzJobWatchdog(
+        AzWatchdogOptions(stall_window_seconds=0, check_interval_seconds=0.05)
+    )
+    popen = subprocess.Popen([sys.executable, "-c", "pass"])
+    popen.wait()
+
+    watchdog.start(popen)
+    time.sleep(0.3)
+    watchdog.stop()
+
+    assert watchdog.stall_event is None
+
+
+def make_client(fake_azcopy: str, max_restarts: int = 3) -> AzClient:
+    return AzClient(
+        exe_to_use=fake_azcopy,
+        watchdog_options=AzWatchdogOptions(
+            stall_window_seconds=1,
+            check_interval_seconds=0.1,
+            max_restarts=max_restarts,
+        ),
+    )
+
+
+def test_stalled_copy_is_resumed(fake_azcopy, tmp_path, monkeypatch):
+    # The fake azcopy stops sending output after the first status line,
+    # resuming the job completes it
+    monkeypatch.setenv("FAKE_AZCOPY_STALL_SECONDS", "30")
+
+    start_time = time.monotonic()
+    job_info = make_client(fake_azcopy).upload_data_to_remote_location(
+        src=AzLocalLocation(str(tmp_path)),
+        dest=make_remote_location("data"),
+        transfer_options=AzCopyOptions(recursive=True),
+    )
+
+    assert time.monotonic() - start_time < 10
+    assert job_info.completed
+    assert job_info.number_of_transfers_completed == 3
+    assert len(job_info.stall_events) == 1
+    assert job_info.stall_events[0]["percent_complete"] == 25.0
+
+    copy_args, resume_args = read_azcopy_log(tmp_path)
+    assert copy_args[0] == "cp"
+    assert resume_args == [
+        "jobs",
+        "resume",
+        job_info.job_id,
+        f"--destination-sas={SAS_TOKEN}",
+    ]
+
+
+def test_stalled_copy_fails_without_restarts(fake_azcopy, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_AZCOPY_STALL_SECONDS", "30")
+
+    with pytest.raises(Exception, match="Job stalled"):
+        make_client(fake_azcopy, max_restarts=0).upload_data_to_remote_location(
+            src=AzLocalLocation(str(tmp_path)),
+            dest=make_remote_location("data"),
+            transfer_options=AzCopyOptions(recursive=True),
+        )
+
+    assert len(read_azcopy_log(tmp_path)) == 1
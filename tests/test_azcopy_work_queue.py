@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import signal
+import sqlite3
+import time
+
+from azcopy_wrapper.azcopy_client import AzClient
+from azcopy_wrapper.azcopy_utilities import (
+    AzCopyJobInfo,
+    AzCopyOptions,
+    AzLocalLocation,
+)
+from azcopy_wrapper.azcopy_work_queue import AzWorkQueue, TaskStatus, run_worker
+from conftest import make_remote_location, read_azcopy_log
+
+
+def enqueue_uploads(queue: AzWorkQueue, count: int) -> None:
+    for i in range(count):
+        queue.enqueue(
+            src=AzLocalLocation(f"/data/file{i}"),
+            dest=make_remote_location(f"file{i}"),
+            transfer_options=AzCopyOptions(),
+        )
+
+
+def get_attempts(db_path: str, task_id: int) -> int:
+    connection = sqlite3.connect(db_path)
+
+    try:
+        return connection.execute(
+            "SELECT attempts FROM tasks WHERE task_id = ?", (task_id,)
+        ).fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_lease_complete_and_counts(tmp_path):
+    queue = AzWorkQueue(str(tmp_path / "queue.db"))
+    enqueue_uploads(queue, 2)
+
+    task = queue.lease("worker")
+    assert task is not None
+    assert isinstance(task.src, AzLocalLocation)
+    assert task.src.path == "/data/file0"
+    assert task.dest.path == "file0"  # type: ignore
+
+    # The leased task is not given to another worker
+    other_task = queue.lease("other-worker")
+    assert other_task is not None
+    assert other_task.task_id != task.task_id
+    assert queue.lease("other-worker") is None
+
+    assert queue.heartbeat(task)
+    assert queue.complete(task, AzCopyJobInfo(completed=True))
+    assert queue.get_job_info(task.task_id)["completed"]  # type: ignore
+    assert queue.get_counts()[TaskStatus.COMPLETED] == 1
+    assert queue.get_counts()[TaskStatus.LEASED] == 1
+
+
+def run_stalled_worker(exe_to_use: str, db_path: str) -> None:
+    # Putting the worker and its azcopy in their own process group,
+    # so that the test can kill both of them
+    os.setpgrp()
+    os.environ["FAKE_AZCOPY_STALL_SECONDS"] = "30"
+    run_worker(
+        AzClient(exe_to_use=exe_to_use),
+        AzWorkQueue(db_path, lease_seconds=1),
+        worker_id="stalled-worker",
+    )
+
+
+def test_lease_reclaimed_after_worker_is_killed(fake_azcopy, tmp_path):
+    db_path = str(tmp_path / "queue.db")
+    queue = AzWorkQueue(db_path, lease_seconds=1)
+    enqueue_uploads(queue, 1)
+
+    worker = multiprocessing.get_context("fork").Process(
+        target=run_stalled_worker, args=(fake_azcopy, db_path)
+    )
+    worker.start()
+
+    wait_until = time.monotonic() + 10
+    while not os.path.exists(tmp_path / "azcopy.log"):
+        assert time.monotonic() < wait_until
+        time.sleep(0.05)
+
+    os.killpg(worker.pid, signal.SIGKILL)  # type: ignore
+    worker.join()
+
+    assert queue.get_counts()[TaskStatus.LEASED] == 1
+
+    tasks_completed = run_worker(
+        AzClient(exe_to_use=fake_azcopy), queue, worker_id="worker", poll_interval=0.1
+    )
+
+    assert tasks_completed == 1
+    assert queue.get_counts()[TaskStatus.COMPLETED] == 1
+    assert queue.get_job_info(1)["completed"]  # type: ignore
+    assert get_attempts(db_path, 1) == 2
+
+
+def run_worker_process(exe_to_use: str, db_path: str, worker_number: int) -> None:
+    run_worker(
+        AzClient(exe_to_use=exe_to_use),
+        AzWorkQueue(db_path, lease_seconds=5),
+        worker_id=f"worker{worker_number}",
+        poll_interval=0.1,
+    )
+
+
+def test_tasks_shared_between_processes(fake_azcopy, tmp_path):
+    db_path = str(tmp_path / "queue.db")
+    queue = AzWorkQueue(db_path)
+    enqueue_uploads(queue, 40)
+
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=run_worker_process, args=(fake_azcopy, db_path, i))
+        for i in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert queue.get_counts()[TaskStatus.COMPLETED] == 40
+
+    # Every task is transferred exactly once
+    transferred = sorted(args[1] for args in read_azcopy_log(tmp_path))
+    assert transferred == sorted(f"/data/file{i}" for i in range(40))
+
+
+def test_job_stopped_when_lease_is_lost(fake_azcopy, tmp_path, monkeypatch):
+    queue = AzWorkQueue(
+        str(tmp_path / "queue.db"), lease_seconds=0.3, max_attempts=1
+    )
+    enqueue_uploads(queue, 1)
+
+    heartbeat_results = iter(
+        [sqlite3.OperationalError("database is locked")] * 2 + [False]
+    )
+
+    def heartbeat(task) -> bool:
+        result = next(heartbeat_results)
+
+        # Errors are retried on the next interval
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+    monkeypatch.setattr(queue, "heartbeat", heartbeat)
+    monkeypatch.setenv("FAKE_AZCOPY_STALL_SECONDS", "30")
+
+    start_time = time.monotonic()
+    tasks_completed = run_worker(
+        AzClient(exe_to_use=fake_azcopy), queue, worker_id="worker", poll_interval=0.1
+    )
+
+    assert tasks_completed == 0
+    assert time.monotonic() - start_time < 10
+    assert queue.get_counts()[TaskStatus.FAILED] == 1